@@ -13,10 +13,31 @@ import zipfile
 import importlib
 import tomllib  # Python 3.11+; use `import toml` if lower
 import tempfile
+import threading
+import errno
+import socket
+import hashlib
+import zlib
 
 # Mirage Store API endpoint
-STORE_API = "https://miragestore.onrender.com"
-STORE_API_PING = "https://miragestore.onrender.com/ping"
+# (MIRAGE_STORE_API points Mirage at another store, e.g. mirage_store_stub.py)
+STORE_API = os.environ.get("MIRAGE_STORE_API", "https://miragestore.onrender.com").rstrip("/")
+STORE_API_PING = STORE_API + "/ping"
+STORE_MAX_CONNECTIONS = 8  # pooled connections, and metadata requests in flight at once
+STORE_TIMEOUT = (5, 30)  # connect, read (seconds)
+STORE_CATALOG_TTL = 10 * 60  # seconds before cached store data is revalidated
+STORE_RETRY_ATTEMPTS = 4
+STORE_RETRY_BASE_DELAY = 0.5  # seconds, doubled per retry
+STORE_RETRY_MAX_DELAY = 10
+STORE_RETRY_STATUSES = (502, 503, 504)  # worth retrying: the store is (re)starting or overloaded
+STORE_BREAKER_THRESHOLD = 3  # failed calls in a row before store calls fail fast
+STORE_BREAKER_COOLDOWN = 30  # seconds
+STORE_WARMUP_TIMEOUT = 90  # read timeout of the login warm-up ping; a cold store can take a while
+# Ping the store in the background at login (--warm-store or MIRAGE_WARM_STORE=1)
+STORE_WARMUP = "--warm-store" in sys.argv or os.environ.get("MIRAGE_WARM_STORE") == "1"
+# Started as the app fork server (see start_fork_server()): skip the shell's
+# startup work (module installs, user files), the server needs none of it
+IS_FORK_SERVER = __name__ == "__main__" and len(sys.argv) > 2 and sys.argv[1] == "--fork-server"
 
 def ensure_imports(modules):
     """
@@ -35,31 +56,129 @@ def ensure_imports(modules):
             print(f"[!] Error checking module '{mod}': {e}")
 
 
-ensure_imports([
-    "colorama",
-    "fortune",
-    "random",
-    "requests",
-    "zipfile",
-    "tomllib",
-    "tempfile"
-])
+if not IS_FORK_SERVER:
+    ensure_imports([
+        "colorama",
+        "fortune",
+        "random",
+        "requests",
+        "zipfile",
+        "tomllib",
+        "tempfile"
+    ])
 
 
 # ---------- Color support ----------
-try:
-    from colorama import init, Fore, Style
-except ImportError:
-    os.system("pip install colorama")
-    from colorama import init, Fore, Style
+# ANSI terminals get escape codes written directly; colorama's stdout wrapper
+# is only installed on Windows, and color is dropped entirely when stdout is
+# not a terminal or Mirage was started with --no-color.
+IS_TTY = sys.stdout.isatty()
+USE_COLOR = IS_TTY and "--no-color" not in sys.argv and "NO_COLOR" not in os.environ \
+    and os.environ.get("TERM") != "dumb"
+USE_COLORAMA = USE_COLOR and platform.system() == "Windows"
 
-init(autoreset=True)
+
+class _AnsiFore:
+    BLACK = "\x1b[30m"
+    RED = "\x1b[31m"
+    GREEN = "\x1b[32m"
+    YELLOW = "\x1b[33m"
+    BLUE = "\x1b[34m"
+    MAGENTA = "\x1b[35m"
+    CYAN = "\x1b[36m"
+    WHITE = "\x1b[37m"
+    RESET = "\x1b[39m"
+
+
+class _AnsiStyle:
+    BRIGHT = "\x1b[1m"
+    DIM = "\x1b[2m"
+    NORMAL = "\x1b[22m"
+    RESET_ALL = "\x1b[0m"
+
+
+class _NoColor:
+    """Stands in for Fore/Style when color is off: every code is an empty string"""
+    def __getattr__(self, name):
+        return ""
+
+
+if USE_COLORAMA:
+    try:
+        from colorama import init, Fore, Style
+    except ImportError:
+        os.system("pip install colorama")
+        from colorama import init, Fore, Style
+
+    init(autoreset=True)
+elif USE_COLOR:
+    Fore, Style = _AnsiFore, _AnsiStyle
+else:
+    Fore, Style = _NoColor(), _NoColor()
+
+_builtin_print = print
+_batch_depth = 0
+_batch_buffer = []
+
+
+def print(*args, sep=" ", end="\n", file=None, flush=False):
+    """
+    Module-wide print: writes straight to stdout, resets colors at the end of
+    each colored line (what colorama's autoreset did) and collects output
+    while inside batched_output().
+    """
+    if USE_COLORAMA or (file is not None and file is not sys.stdout):
+        _builtin_print(*args, sep=sep, end=end, file=file, flush=flush)
+        return
+
+    text = sep.join(str(a) for a in args)
+    if USE_COLOR and "\x1b[" in text:
+        text += _AnsiStyle.RESET_ALL
+    if _batch_depth:
+        _batch_buffer.append(text + end)
+        return
+    sys.stdout.write(text + end)
+    if flush:
+        sys.stdout.flush()
+
+
+class batched_output:
+    """Collect everything printed inside the block and write it to stdout at once"""
+    def __enter__(self):
+        global _batch_depth
+        _batch_depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        global _batch_depth
+        _batch_depth -= 1
+        if _batch_depth == 0 and _batch_buffer:
+            sys.stdout.write("".join(_batch_buffer))
+            _batch_buffer.clear()
+            sys.stdout.flush()
+        return False
+
+
+if USE_COLOR and not USE_COLORAMA:
+    import atexit
+    atexit.register(lambda: sys.stdout.write(_AnsiStyle.RESET_ALL))
 
 # ---------- User Management ----------
 USERS_DIR = os.path.expanduser("~/.MirageUsers")
 USERS_FILE = os.path.join(USERS_DIR, "users.json")
 HISTORY_FILE = os.path.join(USERS_DIR, "mirage_history.txt")
 ALIASES_FILE = os.path.join(USERS_DIR, "mirage_aliases.json")
+STORE_CATALOG_FILE = os.path.join(USERS_DIR, "store_catalog.json")
+STORE_INDEX_FILE = os.path.join(USERS_DIR, "store_search_index.json")
+MAPP_INDEX_FILE = os.path.join(USERS_DIR, "mapp_index.json")
+APP_ENVS_DIR = os.path.join(USERS_DIR, ".envs")
+APP_METRICS_FILE = ".mapp_metrics.jsonl"  # per user, inside their home
+MAPP_CACHE_DIR = os.path.join(USERS_DIR, ".mapp_cache")
+MAPP_CACHE_MAX_BYTES = 256 * 1024 * 1024  # extracted size kept before evicting
+BLOB_STORE_DIR = os.path.join(USERS_DIR, ".blobs")  # downloaded packages, shared by all users
+TRASH_DIR = os.path.join(USERS_DIR, ".trash")
+TRASH_RETENTION = 24 * 60 * 60  # seconds a deleted item stays restorable
+TRASH_PURGE_INTERVAL = 60  # seconds between background purge passes
 MAX_HISTORY = 100
 GUEST_USER = "guest"
 
@@ -102,7 +221,8 @@ def ensure_mirage_files():
 
 
 # Call at startup:
-ensure_mirage_files()
+if not IS_FORK_SERVER:
+    ensure_mirage_files()
 
 def ensure_users_dir():
     if not os.path.exists(USERS_DIR):
@@ -205,6 +325,7 @@ def cleanup_guest():
             # Change to parent directory first to avoid "in use" error
             os.chdir(USERS_DIR)
             shutil.rmtree(guest_dir)
+            discard_user_trash(GUEST_USER)
             print(Fore.CYAN + "✓ Guest session cleaned up")
         except Exception as e:
             print(Fore.YELLOW + f"Warning: Could not clean up guest directory: {e}")
@@ -213,6 +334,7 @@ def cleanup_guest():
     if os.path.exists(guest_dir):
         try:
             shutil.rmtree(guest_dir)
+            discard_user_trash(GUEST_USER)
             print(Fore.CYAN + "✓ Guest session cleaned up")
         except Exception as e:
             print(Fore.YELLOW + f"Warning: Could not clean up guest directory: {e}")
@@ -252,6 +374,7 @@ def delete_user(current_user):
         # Remove from users list
         del users[username]
         save_users(users)
+        discard_user_trash(username)
         print(Fore.GREEN + f"User '{username}' deleted successfully!")
     else:
         print(Fore.YELLOW + "Deletion cancelled.")
@@ -368,9 +491,260 @@ def expand_alias(cmd, aliases):
         return expanded
     return cmd
 
+# ---------- Trash ----------
+_trash_wakeup = threading.Event()
+_trash_purge_all = set()  # users whose whole trash should be emptied next pass
+_trash_lock = threading.Lock()  # guards _trash_purge_all (REPL and purge thread)
+_trash_thread = None
+
+
+def user_trash_dir(username):
+    """Return (files_dir, info_dir) of a user's trash, creating them if needed"""
+    base = os.path.join(TRASH_DIR, username)
+    files_dir = os.path.join(base, "files")
+    info_dir = os.path.join(base, "info")
+    os.makedirs(files_dir, exist_ok=True)
+    os.makedirs(info_dir, exist_ok=True)
+    ensure_hidden(TRASH_DIR)
+    return files_dir, info_dir
+
+
+def move_to_trash(path, username):
+    """
+    Atomically rename a file or directory into the user's trash.
+    Returns the trash id, or None if the trash is on another filesystem.
+    """
+    files_dir, info_dir = user_trash_dir(username)
+    name = os.path.basename(os.path.normpath(path))
+    trash_id = f"{int(time.time() * 1000)}-{name}"
+    while os.path.lexists(os.path.join(files_dir, trash_id)):
+        trash_id = f"{int(time.time() * 1000)}-{random.randint(0, 9999)}-{name}"
+
+    try:
+        os.rename(path, os.path.join(files_dir, trash_id))
+    except OSError as e:
+        if e.errno == errno.EXDEV:  # trash lives on a different filesystem
+            return None
+        raise
+
+    with open(os.path.join(info_dir, trash_id + ".json"), "w") as f:
+        json.dump({
+            "name": name,
+            "original_path": os.path.abspath(path),
+            "deleted": time.time()
+        }, f)
+    _trash_wakeup.set()
+    return trash_id
+
+
+def load_trash(username):
+    """Return the trash entries of a user, oldest first"""
+    files_dir, info_dir = user_trash_dir(username)
+    entries = []
+    for info_file in os.listdir(info_dir):
+        if not info_file.endswith(".json"):
+            continue
+        trash_id = info_file[:-5]
+        try:
+            with open(os.path.join(info_dir, info_file), "r") as f:
+                info = json.load(f)
+        except Exception:
+            continue
+        if not os.path.lexists(os.path.join(files_dir, trash_id)):
+            continue
+        info["id"] = trash_id
+        entries.append(info)
+    return sorted(entries, key=lambda e: e.get("deleted", 0))
+
+
+def _purge_tree(path):
+    """Delete a tree bottom-up, yielding the disk now and then"""
+    if os.path.islink(path) or not os.path.isdir(path):
+        os.remove(path)
+        return
+    removed = 0
+    for root, dirs, files in os.walk(path, topdown=False):
+        for name in files:
+            try:
+                os.remove(os.path.join(root, name))
+            except FileNotFoundError:
+                pass
+            removed += 1
+            if removed % 256 == 0:
+                time.sleep(0.01)
+        for name in dirs:
+            dir_path = os.path.join(root, name)
+            if os.path.islink(dir_path):
+                os.remove(dir_path)
+            else:
+                os.rmdir(dir_path)
+    os.rmdir(path)
+
+
+def discard_user_trash(username):
+    """
+    Move a user's whole trash aside for the purger (guest logout, deleted
+    account), so a later account with the same name starts with an empty one.
+    """
+    base = os.path.join(TRASH_DIR, username)
+    if not os.path.isdir(base):
+        return
+    try:
+        os.rename(base, os.path.join(TRASH_DIR, f".discarded-{int(time.time() * 1000)}-{username}"))
+    except OSError:
+        with _trash_lock:
+            _trash_purge_all.add(username)
+    _trash_wakeup.set()
+
+
+def purge_trash():
+    """
+    Delete expired trash entries, everything for users queued by 'trash empty'
+    and the whole trash of accounts that no longer exist.
+    """
+    if not os.path.isdir(TRASH_DIR):
+        return
+    now = time.time()
+    names = os.listdir(TRASH_DIR)
+    try:
+        known = set(load_users()) | {GUEST_USER}
+    except Exception:
+        known = None  # can't tell who was deleted this pass; keep everything
+    with _trash_lock:
+        purge_all_users = set(_trash_purge_all)
+        _trash_purge_all.clear()
+    for username in names:
+        if known is not None and username not in known:
+            try:
+                _purge_tree(os.path.join(TRASH_DIR, username))
+            except Exception:
+                pass
+            continue
+        if username.startswith("."):
+            continue
+        purge_all = username in purge_all_users
+        files_dir, info_dir = user_trash_dir(username)
+        for entry in load_trash(username):
+            if not purge_all and now - entry.get("deleted", 0) < TRASH_RETENTION:
+                continue
+            try:
+                _purge_tree(os.path.join(files_dir, entry["id"]))
+                os.remove(os.path.join(info_dir, entry["id"] + ".json"))
+            except Exception:
+                pass
+
+
+def _trash_worker():
+    # Run at the lowest priority; on Linux the I/O priority follows the nice value
+    if hasattr(os, "setpriority"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except Exception:
+            pass
+    while True:
+        _trash_wakeup.wait(TRASH_PURGE_INTERVAL)
+        _trash_wakeup.clear()
+        try:
+            purge_trash()
+            gc_blob_store()
+        except Exception:
+            pass
+
+
+def start_trash_purger():
+    """Start the background trash purge thread (once per session)"""
+    global _trash_thread
+    if _trash_thread is None:
+        _trash_thread = threading.Thread(target=_trash_worker, name="mirage-trash", daemon=True)
+        _trash_thread.start()
+        _trash_wakeup.set()
+
+
+def remove_path(args, username):
+    """Handle 'rm [-f] [--now] FILE': trash by default, delete in place with --now"""
+    force = "-f" in args
+    now = "--now" in args
+    targets = [a for a in args if a not in ("-f", "--now")]
+    if not targets:
+        print(Fore.RED + "Usage: rm [-f] [--now] FILE")
+        return
+
+    for fname in targets:
+        if not os.path.lexists(fname):
+            if not force:
+                print(Fore.RED + f"'{fname}' not found.")
+            continue
+        try:
+            if not now:
+                trash_id = move_to_trash(fname, username)
+                if trash_id is not None:
+                    print(Fore.GREEN + f"Moved '{fname}' to trash " + Fore.WHITE + f"(restore with: trash restore {trash_id})")
+                    continue
+                print(Fore.YELLOW + f"'{fname}' is on another filesystem, deleting in place...")
+            if os.path.isdir(fname) and not os.path.islink(fname):
+                shutil.rmtree(fname)
+            else:
+                os.remove(fname)
+            print(Fore.GREEN + f"Deleted '{fname}'")
+        except Exception as e:
+            print(Fore.RED + f"Error: {e}")
+
+
+def manage_trash(args, username):
+    """Manage the trash: list, restore, empty"""
+    if not args or args[0] == "list":
+        entries = load_trash(username)
+        if not entries:
+            print(Fore.YELLOW + "Trash is empty.")
+            return
+        print(Fore.CYAN + "Trash:")
+        for entry in entries:
+            deleted = datetime.fromtimestamp(entry.get("deleted", 0)).strftime('%Y-%m-%d %H:%M:%S')
+            print(Fore.YELLOW + f"  {entry['id']} " + Fore.WHITE + f"→ {entry.get('original_path', '?')} ({deleted})")
+
+    elif args[0] == "restore":
+        if len(args) < 2:
+            print(Fore.RED + "Usage: trash restore <id|name>")
+            return
+        files_dir, info_dir = user_trash_dir(username)
+        # Match by id first, then by most recently deleted entry with that name
+        matches = [e for e in load_trash(username) if e["id"] == args[1]]
+        if not matches:
+            matches = [e for e in load_trash(username) if e.get("name") == args[1]]
+        if not matches:
+            print(Fore.RED + f"'{args[1]}' not found in trash.")
+            return
+        entry = matches[-1]
+        dest = entry.get("original_path") or os.path.join(os.getcwd(), entry["name"])
+        if os.path.lexists(dest):
+            print(Fore.RED + f"Cannot restore: '{dest}' already exists.")
+            return
+        try:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.move(os.path.join(files_dir, entry["id"]), dest)
+            os.remove(os.path.join(info_dir, entry["id"] + ".json"))
+            print(Fore.GREEN + f"✓ Restored '{dest}'")
+        except Exception as e:
+            print(Fore.RED + f"Error: {e}")
+
+    elif args[0] == "empty":
+        with _trash_lock:
+            _trash_purge_all.add(username)
+        start_trash_purger()
+        _trash_wakeup.set()
+        print(Fore.GREEN + "✓ Emptying trash in the background")
+
+    else:
+        print(Fore.RED + "Unknown subcommand. Use: list, restore, empty")
+
 # ---------- Splash Screen ----------
 def clear():
-    os.system("clear" if platform.system() != "Windows" else "cls")
+    if platform.system() == "Windows":
+        os.system("cls")
+    elif IS_TTY:
+        # Home the cursor, clear the screen and the scrollback without forking a shell
+        sys.stdout.write("\x1b[H\x1b[2J\x1b[3J")
+        sys.stdout.flush()
 
 def splash_screen():
     clear()
@@ -614,14 +988,24 @@ def help_menu():
     print(Fore.YELLOW + "  pwd              " + Fore.WHITE + "- Show current directory")
     print(Fore.YELLOW + "  cd DIR           " + Fore.WHITE + "- Change directory")
     print(Fore.CYAN + "\n  === .mapp Applications ===")
-    print(Fore.YELLOW + "  mapp list        " + Fore.WHITE + "- List all .mapp files")
+    print(Fore.YELLOW + "  mapp list [DIR]  " + Fore.WHITE + "- List all .mapp files")
     print(Fore.YELLOW + "  mapp new FILE    " + Fore.WHITE + "- Create new .mapp template")
+    print(Fore.YELLOW + "  mapp check [PATH...]" + Fore.WHITE + " - Validate .mapp apps (manifest, entry point, sources)")
+    print(Fore.YELLOW + "  mapp migrate [PATH...]" + Fore.WHITE + " - Convert old single-file .mapp apps to the packaged format")
+    print(Fore.YELLOW + "  mapp env [list|gc]" + Fore.WHITE + " - Show or clean up app dependency environments")
+    print(Fore.YELLOW + "  mapp package DIR " + Fore.WHITE + "- Package a .mapp folder (-o FILE, --level N, --ignore PAT, --pyc)")
     print(Fore.YELLOW + "  run FILE.mapp    " + Fore.WHITE + "- Run a .mapp application")
+    print(Fore.YELLOW + "  run --zip FILE   " + Fore.WHITE + "- Run a packaged .mapp straight from the archive")
+    print(Fore.YELLOW + "  run --log LOG FILE" + Fore.WHITE + " - Run a .mapp, also saving its output to LOG")
+    print(Fore.YELLOW + "  run --parallel N A B ..." + Fore.WHITE + " - Run non-interactive .mapps at once (--yes skips prompts, --log LOG saves output)")
     print(Fore.CYAN + "\n  === Mirage Store ===")
-    print(Fore.YELLOW + "  ms list          " + Fore.WHITE + "- List apps in the store")
-    print(Fore.YELLOW + "  ms ping          " + Fore.WHITE + "- Ping the MirageStore servers")
-    print(Fore.YELLOW + "  ms download FILE " + Fore.WHITE + "- Download app from store")
-    print(Fore.YELLOW + "  ms upload FILE   " + Fore.WHITE + "- Upload app to store")
+    print(Fore.YELLOW + "  ms list          " + Fore.WHITE + "- List apps in the store (--offline: cached catalog only, --refresh: revalidate now)")
+    print(Fore.YELLOW + "  ms search QUERY  " + Fore.WHITE + "- Search the store by name, author and description (--update: fetch missing details)")
+    print(Fore.YELLOW + "  ms ping          " + Fore.WHITE + "- Ping the MirageStore servers (-n COUNT -i INTERVAL --concurrency K: latency percentiles)")
+    print(Fore.YELLOW + "  ms cache [gc]    " + Fore.WHITE + "- Show or clean the package store shared by all users")
+    print(Fore.YELLOW + "  ms download FILE " + Fore.WHITE + "- Download apps from store (several names or globs at once)")
+    print(Fore.YELLOW + "  ms sync MANIFEST [DIR] " + Fore.WHITE + "- Download the apps listed in MANIFEST ([apps] name = \"version\"), --prune to trash the rest")
+    print(Fore.YELLOW + "  ms upload FILE   " + Fore.WHITE + "- Upload app to store (--compress: gzip it on the way)")
     print(Fore.CYAN + "\n  === File Operations ===")
     print(Fore.YELLOW + "  cat FILE         " + Fore.WHITE + "- Show file contents")
     print(Fore.YELLOW + "  head FILE [N]    " + Fore.WHITE + "- Show first N lines (default 10)")
@@ -630,7 +1014,11 @@ def help_menu():
     print(Fore.YELLOW + "  wc FILE          " + Fore.WHITE + "- Count lines, words, chars")
     print(Fore.YELLOW + "  touch FILE       " + Fore.WHITE + "- Create empty file")
     print(Fore.YELLOW + "  mkdir DIR        " + Fore.WHITE + "- Create directory")
-    print(Fore.YELLOW + "  rm FILE          " + Fore.WHITE + "- Delete file/directory")
+    print(Fore.YELLOW + "  rm FILE          " + Fore.WHITE + "- Move file/directory to trash")
+    print(Fore.YELLOW + "  rm -f --now FILE " + Fore.WHITE + "- Delete file/directory immediately")
+    print(Fore.YELLOW + "  trash [list]     " + Fore.WHITE + "- Show deleted files")
+    print(Fore.YELLOW + "  trash restore ID " + Fore.WHITE + "- Restore a deleted file")
+    print(Fore.YELLOW + "  trash empty      " + Fore.WHITE + "- Permanently delete trash")
     print(Fore.YELLOW + "  cp SRC DST       " + Fore.WHITE + "- Copy file")
     print(Fore.YELLOW + "  mv SRC DST       " + Fore.WHITE + "- Move file")
     print(Fore.YELLOW + "  rename OLD NEW   " + Fore.WHITE + "- Rename file/directory")
@@ -764,6 +1152,7 @@ def run_editor(filename):
     Launch a text editor for the given file.
     Uses mirage_editor.py on Windows, nano on Linux.
     """
+    unshare_blob_link(filename)  # don't edit a downloaded package in the shared store
     if sys.platform.startswith("win"):
         editor_path = os.path.join(os.path.dirname(__file__), "mirage_editor.py")
         if not os.path.exists(editor_path):
@@ -952,54 +1341,817 @@ def pull_file(source_path):
         print(Fore.RED + f"Error pulling file: {e}")
 
 
+# ---------- App Runtime (fork server) ----------
+# A long-lived server process imports the common modules once and keeps a
+# few pre-forked idle workers. Each .mapp launch is handed to one worker,
+# which becomes the app process (right cwd, argv and stdio) and exits with
+# it; the server then forks a fresh worker in its place.
+FORK_SERVER_PRELOAD = ["colorama", "requests", "json", "random", "math", "datetime", "time"]
+FORK_POOL_SIZE = max(2, min(8, os.cpu_count() or 2))
+APP_LIMITS = {
+    # manifest [limits] key: (resource.RLIMIT_* name, factor to the rlimit unit)
+    "cpu_seconds": ("RLIMIT_CPU", 1),
+    "address_space_mb": ("RLIMIT_AS", 1024 * 1024),
+    "open_files": ("RLIMIT_NOFILE", 1),
+}
+# Seconds of CPU between the SIGXCPU warning (soft limit) and SIGKILL (hard limit)
+APP_CPU_KILL_GRACE = 5
+STREAM_MAX_LINE = 64 * 1024  # longest unfinished output line held before passing it on
+# Sets rlimits, then execs the app command: python -c LIMITS_BOOTSTRAP RLIMITS_JSON COMMAND...
+# (limits are applied in the child itself; preexec_fn isn't safe with threads)
+LIMITS_BOOTSTRAP = (
+    "import json, os, resource, sys; "
+    "[resource.setrlimit(getattr(resource, name), (soft, hard)) for name, soft, hard in json.loads(sys.argv[1])]; "
+    "os.execv(sys.argv[2], sys.argv[2:])"
+)
+# Runs a module straight out of a .mapp archive: python -c ZIP_BOOTSTRAP ARCHIVE MODULE
+ZIP_BOOTSTRAP = (
+    "import runpy, sys; archive, module = sys.argv[1:3]; sys.argv = [archive]; "
+    "sys.path.insert(0, archive); runpy.run_module(module, run_name='__main__', alter_sys=True)"
+)
+
+_fork_server = None  # {"proc": Popen, "ctrl": socket, "lock": Lock}
+
+
+def start_fork_server():
+    """Start the fork server in the background (POSIX only, once per session)"""
+    global _fork_server
+    if _fork_server is not None or not hasattr(os, "fork") or not hasattr(socket, "send_fds"):
+        return
+    try:
+        ctrl, remote = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--fork-server", str(remote.fileno())],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            pass_fds=(remote.fileno(),)
+        )
+        remote.close()
+        _fork_server = {"proc": proc, "ctrl": ctrl, "lock": threading.Lock()}
+    except Exception:
+        _fork_server = None
+
+
+def fork_server_submit(argv, cwd, stdio=(0, 1, 2), module=None, limits=None):
+    """
+    Hand an app launch to the fork server. With module, argv[0] is a zip
+    archive that is put on sys.path and the module is run from it.
+    Returns a socket the exit report will arrive on, or None if the server is unavailable.
+    """
+    global _fork_server
+    if _fork_server is None or _fork_server["proc"].poll() is not None:
+        return None
+    reply, remote = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    request = json.dumps({"argv": argv, "cwd": cwd, "module": module, "limits": limits}).encode("utf-8")
+    try:
+        with _fork_server["lock"]:
+            socket.send_fds(_fork_server["ctrl"], [request], [remote.fileno(), *stdio])
+    except OSError:
+        reply.close()
+        _fork_server = None
+        return None
+    finally:
+        remote.close()
+    return reply
+
+
+def fork_server_wait(reply):
+    """Wait for an app started by fork_server_submit(); returns its exit report"""
+    data = b""
+    try:
+        while True:
+            try:
+                chunk = reply.recv(4096)
+            except KeyboardInterrupt:
+                continue  # Ctrl-C went to the app as well; keep waiting for it to exit
+            if not chunk:
+                break
+            data += chunk
+    finally:
+        reply.close()
+    try:
+        return json.loads(data.decode("utf-8"))
+    except ValueError:
+        return {"returncode": None, "rusage": None}
+
+
+def _fork_server_main(ctrl_fd):
+    """Entry point of the fork server process (mirage.py --fork-server FD)"""
+    import selectors
+    import signal
+
+    for mod in FORK_SERVER_PRELOAD:
+        try:
+            importlib.import_module(mod)
+        except Exception:
+            pass
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is for the apps, not the server
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_w, False)
+    signal.signal(signal.SIGCHLD, lambda *args: None)
+    signal.set_wakeup_fd(wake_w, warn_on_full_buffer=False)
+
+    ctrl = socket.socket(fileno=ctrl_fd)
+    sel = selectors.DefaultSelector()
+    sel.register(ctrl, selectors.EVENT_READ, "ctrl")
+    sel.register(sys.stdin, selectors.EVENT_READ, "parent")
+    sel.register(wake_r, selectors.EVENT_READ, "sigchld")
+
+    idle = []  # [(pid, channel)]
+    running = {}  # pid -> reply socket
+
+    def spawn_worker():
+        chan, worker_chan = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        pid = os.fork()
+        if pid == 0:
+            # Drop everything that belongs to the server before waiting for a job
+            signal.set_wakeup_fd(-1)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            sel.close()
+            for fd in (wake_r, wake_w):
+                os.close(fd)
+            ctrl.close()
+            chan.close()
+            for _, other in idle:
+                other.close()
+            for reply, worker in running.values():
+                reply.close()
+                worker.close()
+            _fork_worker(worker_chan)
+        worker_chan.close()
+        idle.append((pid, chan))
+
+    def reap():
+        while True:
+            try:
+                pid, status, usage = os.wait4(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            reply, chan = running.pop(pid, (None, None))
+            if reply is not None:
+                inherited_kb = None
+                try:
+                    chan.setblocking(False)
+                    inherited_kb = json.loads(chan.recv(256).decode("utf-8"))["rss_kb"]
+                except (OSError, ValueError, KeyError):
+                    pass
+                chan.close()
+                report = {
+                    "returncode": os.waitstatus_to_exitcode(status),
+                    "rusage": usage_dict(usage, inherited_kb),
+                }
+                try:
+                    reply.sendall(json.dumps(report).encode("utf-8"))
+                except OSError:
+                    pass
+                reply.close()
+            else:
+                # An idle worker died on its own; replace it
+                for i, (idle_pid, chan) in enumerate(idle):
+                    if idle_pid == pid:
+                        chan.close()
+                        del idle[i]
+                        break
+
+    for _ in range(FORK_POOL_SIZE):
+        spawn_worker()
+
+    while True:
+        for key, _ in sel.select(timeout=5):
+            if key.data == "parent":
+                # Mirage went away: idle workers exit when their channel closes
+                for _, chan in idle:
+                    chan.close()
+                os._exit(0)
+            elif key.data == "sigchld":
+                try:
+                    os.read(wake_r, 512)
+                except BlockingIOError:
+                    pass
+            elif key.data == "ctrl":
+                try:
+                    msg, fds, _, _ = socket.recv_fds(ctrl, 65536, 4)
+                except OSError:
+                    continue
+                if len(fds) != 4:
+                    for fd in fds:
+                        os.close(fd)
+                    continue
+                reply = socket.socket(fileno=fds[0])
+                if not idle:
+                    spawn_worker()
+                pid, chan = idle.pop(0)
+                try:
+                    socket.send_fds(chan, [msg], fds[1:])
+                    running[pid] = (reply, chan)  # the worker reports its starting RSS on chan
+                except OSError:
+                    reply.close()
+                    chan.close()
+                for fd in fds[1:]:
+                    os.close(fd)
+        reap()
+        while len(idle) < FORK_POOL_SIZE:
+            spawn_worker()
+
+
+def _fork_worker(chan):
+    """Body of a pre-forked worker: wait for one job, become the app, exit"""
+    import runpy
+    import signal
+    import traceback
+
+    try:
+        msg, fds, _, _ = socket.recv_fds(chan, 65536, 3)
+    except Exception:
+        os._exit(1)
+    if not msg or len(fds) != 3:
+        os._exit(0)
+    try:
+        # Memory shared with the server so far, not the app's own
+        chan.sendall(json.dumps({"rss_kb": current_rss_kb()}).encode("utf-8"))
+    except OSError:
+        pass
+    chan.close()
+    job = json.loads(msg.decode("utf-8"))
+
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    sys.stdin = sys.__stdin__ = open(0, "r", closefd=False)
+    # Line buffered even into a pipe, so Mirage can stream the output live
+    sys.stdout = sys.__stdout__ = open(1, "w", buffering=1, closefd=False)
+    sys.stderr = sys.__stderr__ = open(2, "w", buffering=1, closefd=False)
+
+    code = 0
+    try:
+        if job.get("limits"):
+            apply_app_limits(job["limits"])
+        os.chdir(job["cwd"])
+        script = job["argv"][0]
+        sys.argv = list(job["argv"])
+        if job.get("module"):
+            # Zip-based app: the archive itself goes on sys.path (zipimport)
+            sys.path[0] = script
+            runpy.run_module(job["module"], run_name="__main__", alter_sys=True)
+        else:
+            sys.path[0] = os.path.dirname(os.path.abspath(script))
+            runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+
+    # Same shutdown the interpreter would do, then leave without unwinding into the server
+    try:
+        threading._shutdown()
+    except Exception:
+        pass
+    try:
+        import atexit
+        atexit._run_exitfuncs()
+    except Exception:
+        pass
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    os._exit(code & 0xFF)
+
+
+def app_rlimits(limits):
+    """[(RLIMIT_* name, soft, hard)] for the manifest [limits], capped by the current hard limits"""
+    import resource
+    rlimits = []
+    for key, value in (limits or {}).items():
+        name, scale = APP_LIMITS[key]
+        soft, hard = resource.getrlimit(getattr(resource, name))
+        value = int(value * scale)
+        # CPU: the app gets SIGXCPU at the limit (catchable), SIGKILL a little later
+        new_hard = value + APP_CPU_KILL_GRACE if name == "RLIMIT_CPU" else value
+        if hard != resource.RLIM_INFINITY:
+            value, new_hard = min(value, hard), min(new_hard, hard)
+        rlimits.append((name, value, new_hard))
+    return rlimits
+
+
+def apply_app_limits(limits):
+    """setrlimit() the manifest [limits] in the current (app) process"""
+    import resource
+    for name, soft, hard in app_rlimits(limits):
+        resource.setrlimit(getattr(resource, name), (soft, hard))
+
+
+def usage_dict(usage, inherited_kb=None):
+    """
+    The parts of a struct rusage Mirage reports. maxrss_kb is the peak
+    resident memory of the app process, however it was started. With
+    inherited_kb, the resident memory a fork-server worker already had from
+    the server when its app started, app_rss_kb is the peak above that.
+    """
+    maxrss = usage.ru_maxrss
+    if sys.platform == "darwin":
+        maxrss //= 1024  # bytes on macOS, KiB on Linux
+    report = {"utime": usage.ru_utime, "stime": usage.ru_stime, "maxrss_kb": maxrss}
+    if inherited_kb is not None:
+        report["app_rss_kb"] = max(0, maxrss - inherited_kb)
+    return report
+
+
+def current_rss_kb():
+    """Resident memory of this process now, in KiB"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        import resource
+        return usage_dict(resource.getrusage(resource.RUSAGE_SELF))["maxrss_kb"]
+
+
+def stream_pipes(out_fd, err_fd, on_output):
+    """
+    Read an app's stdout and stderr pipes to EOF, calling
+    on_output("stdout" | "stderr", text) as soon as complete lines (or
+    carriage-return progress updates) arrive. Memory stays bounded: at
+    most STREAM_MAX_LINE bytes of an unfinished line are held per pipe.
+    """
+    import codecs
+    import selectors
+    names = {out_fd: "stdout", err_fd: "stderr"}
+    pending = {out_fd: b"", err_fd: b""}
+    # Incremental decoders keep a UTF-8 character split across pieces whole
+    decoders = {fd: codecs.getincrementaldecoder("utf-8")(errors="replace") for fd in names}
+    with selectors.DefaultSelector() as sel:
+        sel.register(out_fd, selectors.EVENT_READ)
+        sel.register(err_fd, selectors.EVENT_READ)
+        open_fds = 2
+        while open_fds:
+            try:
+                ready = sel.select()
+            except KeyboardInterrupt:
+                continue  # the app got the Ctrl-C too
+            for key, _ in ready:
+                data = os.read(key.fd, 65536)
+                if not data:
+                    sel.unregister(key.fd)
+                    open_fds -= 1
+                    text = decoders[key.fd].decode(pending[key.fd], final=True)
+                    if text:
+                        on_output(names[key.fd], text)
+                    continue
+                buf = pending[key.fd] + data
+                cut = max(buf.rfind(b"\n"), buf.rfind(b"\r")) + 1
+                if cut == 0 and len(buf) >= STREAM_MAX_LINE:
+                    cut = len(buf)  # a very long line: pass it on in pieces
+                if cut:
+                    text = decoders[key.fd].decode(buf[:cut])
+                    if text:
+                        on_output(names[key.fd], text)
+                pending[key.fd] = buf[cut:]
+
+
+def run_app_process(script, interactive=True, module=None, limits=None, on_output=None, python=None):
+    """
+    Run a Python app script, through the fork server when it is up.
+    python selects another interpreter (an app environment); those apps
+    always start as a fresh subprocess.
+    With module, script is a .mapp archive and the module is run from inside it.
+    limits are manifest [limits] applied with setrlimit in the app process.
+    When not interactive, output is streamed to on_output(stream, text) as
+    it is produced (see stream_pipes).
+    Returns a dict with returncode, rusage (None where unavailable) and wall time in seconds.
+    """
+    sys.stdout.flush()
+    argv = [os.path.abspath(script)]
+    cwd = os.getcwd()
+    if module:
+        command = [python or sys.executable, "-c", ZIP_BOOTSTRAP, argv[0], module]
+    else:
+        command = [python or sys.executable, script]
+    result = {"returncode": None, "rusage": None}
+    started = time.perf_counter()
+    if on_output is None:
+        on_output = lambda stream, text: print(text, end="", flush=True)
+    env = None
+    if not interactive:
+        env = dict(os.environ, PYTHONUNBUFFERED="1")  # so output shows up live
+
+    if not hasattr(os, "wait4"):
+        # Windows: no rusage and no rlimits, plain subprocess with reader threads
+        if interactive:
+            result["returncode"] = subprocess.run(command).returncode
+        else:
+            proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+            lock = threading.Lock()
+
+            def pump(pipe, name):
+                import codecs
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                # Bounded like stream_pipes: a very long line comes in pieces
+                for line in iter(lambda: pipe.readline(STREAM_MAX_LINE), b""):
+                    text = decoder.decode(line)
+                    if text:
+                        with lock:
+                            on_output(name, text)
+                text = decoder.decode(b"", final=True)
+                if text:
+                    with lock:
+                        on_output(name, text)
+
+            readers = [threading.Thread(target=pump, args=(proc.stdout, "stdout")),
+                       threading.Thread(target=pump, args=(proc.stderr, "stderr"))]
+            for t in readers:
+                t.start()
+            for t in readers:
+                t.join()
+            result["returncode"] = proc.wait()
+        result["wall"] = time.perf_counter() - started
+        return result
+
+    stdio = (0, 1, 2)
+    if not interactive:
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        stdio = (0, out_w, err_w)
+
+    reply = None
+    if python is None:
+        reply = fork_server_submit(argv, cwd, stdio, module=module, limits=limits)
+    proc = None
+    if reply is None:
+        if limits:
+            command = [command[0], "-c", LIMITS_BOOTSTRAP, json.dumps(app_rlimits(limits)), *command]
+        proc = subprocess.Popen(command, stdout=stdio[1], stderr=stdio[2], env=env)
+
+    if not interactive:
+        os.close(out_w)
+        os.close(err_w)
+        stream_pipes(out_r, err_r, on_output)
+        os.close(out_r)
+        os.close(err_r)
+
+    if proc is None:
+        report = fork_server_wait(reply)
+        result.update(returncode=report["returncode"], rusage=report["rusage"])
+    else:
+        while True:
+            try:
+                _, status, usage = os.wait4(proc.pid, 0)
+                break
+            except KeyboardInterrupt:
+                continue
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        result.update(returncode=proc.returncode, rusage=usage_dict(usage))
+    result["wall"] = time.perf_counter() - started
+    return result
+
+
+# ---------- .mapp Extraction Cache ----------
+# Packaged apps are unpacked (and byte-compiled) once into
+# MAPP_CACHE_DIR/<sha256 of the archive>. Each launch runs from a private
+# copy of that entry, so files an app writes next to itself don't leak into
+# later runs. Entries are pinned with a shared flock while they are copied;
+# evict_mapp_cache() only removes entries it can lock exclusively.
+MAPP_CACHE_SIZE_FILE = ".mirage-cache-size"
+MAPP_CACHE_GRACE = 60  # seconds a freshly extracted entry is safe from eviction
+
+_mapp_hash_memo = {}  # (path, size, mtime_ns) -> sha256
+
+
+def mapp_content_hash(path):
+    """sha256 of a file, remembered for as long as its size and mtime don't change"""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if key not in _mapp_hash_memo:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        _mapp_hash_memo[key] = h.hexdigest()
+    return _mapp_hash_memo[key]
+
+
+def pin_mapp_cache_entry(target):
+    """
+    Take a shared lock on a cache entry; evict_mapp_cache() leaves it alone
+    until the returned fd is closed. Returns None where flock isn't
+    available, and False if the entry doesn't exist (or was just evicted).
+    """
+    try:
+        import fcntl
+        fd = os.open(target, os.O_RDONLY)
+    except ImportError:
+        return None if os.path.isdir(target) else False
+    except OSError:
+        return False
+    fcntl.flock(fd, fcntl.LOCK_SH)
+    if os.fstat(fd).st_nlink == 0:  # removed while we waited for the lock
+        os.close(fd)
+        return False
+    return fd
+
+
+def extract_mapp_cached(path):
+    """
+    Return a private directory holding the full contents of a packaged
+    .mapp, copied from the extraction cache. The caller removes it.
+    """
+    digest = mapp_content_hash(path)
+    target = os.path.join(MAPP_CACHE_DIR, digest)
+    while True:
+        pin = pin_mapp_cache_entry(target)
+        if pin is not False:
+            break
+        extract_mapp_entry(path, target)
+    try:
+        os.utime(target)  # LRU bookkeeping
+        run_dir = tempfile.mkdtemp(prefix="mirage-run-")
+        try:
+            # copy2 keeps mtimes, so the entry's __pycache__ stays valid
+            shutil.copytree(target, run_dir, dirs_exist_ok=True, copy_function=shutil.copy2,
+                            ignore=shutil.ignore_patterns(MAPP_CACHE_SIZE_FILE))
+        except BaseException:
+            shutil.rmtree(run_dir, ignore_errors=True)
+            raise
+    finally:
+        if pin is not None:
+            os.close(pin)
+    return run_dir
+
+
+def extract_mapp_entry(path, target):
+    """Unpack and byte-compile a .mapp into the cache entry target"""
+    import compileall
+    os.makedirs(MAPP_CACHE_DIR, exist_ok=True)
+    ensure_hidden(MAPP_CACHE_DIR)
+    # Unpack privately, then publish with an atomic rename; if another
+    # session got there first, keep theirs and drop ours.
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=MAPP_CACHE_DIR)
+    try:
+        with zipfile.ZipFile(path, "r") as zf:
+            zf.extractall(tmp_dir)
+            size = sum(info.file_size for info in zf.infolist())
+            optimize = package_optimize(zf.comment)
+        compileall.compile_dir(tmp_dir, quiet=2)  # so no run has to compile (or write) it again
+        install_embedded_bytecode(tmp_dir, optimize)
+        with open(os.path.join(tmp_dir, MAPP_CACHE_SIZE_FILE), "w") as f:
+            f.write(str(size))
+        try:
+            os.rename(tmp_dir, target)
+        except OSError:
+            if not os.path.isdir(target):
+                raise
+    finally:
+        if os.path.isdir(tmp_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    evict_mapp_cache(keep=os.path.basename(target))
+
+
+def has_current_magic(pyc_path):
+    """True if a .pyc was compiled by this interpreter version"""
+    import importlib.util
+    try:
+        with open(pyc_path, "rb") as f:
+            return f.read(4) == importlib.util.MAGIC_NUMBER
+    except OSError:
+        return False
+
+
+def install_embedded_bytecode(root, optimize=0):
+    """
+    Copy NAME.pyc files shipped next to NAME.py (mapp package --pyc) into
+    __pycache__ when their magic number matches, so imports skip compiling.
+    Mismatched ones are left alone and the source is compiled as usual.
+    Bytecode built with --optimize goes under its .opt-N name, where only
+    an interpreter running with -O/-OO looks, and is moved rather than
+    copied so the entry script isn't run from it either.
+    """
+    import importlib.util
+    for dirpath, dirs, files in os.walk(root):
+        for f in files:
+            if not f.endswith(".pyc") or f[:-1] not in files:
+                continue
+            pyc_path = os.path.join(dirpath, f)
+            if has_current_magic(pyc_path):
+                cache_path = importlib.util.cache_from_source(
+                    os.path.join(dirpath, f[:-1]), optimization=optimize or ""
+                )
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                if optimize:
+                    os.replace(pyc_path, cache_path)
+                else:
+                    shutil.copyfile(pyc_path, cache_path)
+
+
+def embedded_bytecode(script_path):
+    """The shipped .pyc for an entry script if this interpreter can run it, else the script"""
+    pyc_path = script_path + "c"
+    if script_path.endswith(".py") and has_current_magic(pyc_path):
+        return pyc_path
+    return script_path
+
+
+def evict_mapp_cache(keep=None):
+    """Remove least recently used entries until the cache fits MAPP_CACHE_MAX_BYTES"""
+    try:
+        names = os.listdir(MAPP_CACHE_DIR)
+    except OSError:
+        return
+    now = time.time()
+    entries = []
+    total = 0
+    for name in names:
+        entry_path = os.path.join(MAPP_CACHE_DIR, name)
+        try:
+            used = os.stat(entry_path).st_mtime
+        except OSError:
+            continue
+        if name.startswith(".tmp-"):
+            # Leftover from a session that died mid-extraction
+            if now - used > 3600:
+                shutil.rmtree(entry_path, ignore_errors=True)
+            continue
+        try:
+            with open(os.path.join(entry_path, MAPP_CACHE_SIZE_FILE), "r") as f:
+                size = int(f.read())
+        except (OSError, ValueError):
+            size = 0
+        total += size
+        entries.append((used, name, size))
+
+    for used, name, size in sorted(entries):
+        if total <= MAPP_CACHE_MAX_BYTES:
+            break
+        if name == keep or now - used < MAPP_CACHE_GRACE:
+            continue
+        entry_path = os.path.join(MAPP_CACHE_DIR, name)
+        try:
+            import fcntl
+            fd = os.open(entry_path, os.O_RDONLY)
+        except ImportError:
+            fd = None
+        except OSError:
+            continue
+        try:
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total -= size
+        except BlockingIOError:
+            continue  # being copied by another session
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+
+def read_zip_manifest(zf):
+    """
+    (manifest, entry point) of an open .mapp archive. Raises ValueError if
+    the manifest is missing or invalid or the entry point isn't packaged.
+    """
+    names = zf.namelist()
+    if "manifest.toml" not in names:
+        raise ValueError("manifest.toml not found in .mapp")
+    with zf.open("manifest.toml") as mf:
+        try:
+            manifest = tomllib.load(mf)
+        except tomllib.TOMLDecodeError as e:
+            raise ValueError(f"Bad manifest.toml: {e}")
+    if "app" not in manifest:
+        raise ValueError("manifest.toml has no [app] table")
+    entry_point = manifest["app"].get("entry_point", "main.py")
+    if entry_point not in names:
+        raise ValueError(f"Entry point '{entry_point}' not found in .mapp")
+    return manifest, entry_point
 
 
 def parse_mapp_file(filename):
-    """Parse a .mapp file (zip-based Mirage Application)"""
+    """
+    Parse a .mapp file (zip-based Mirage Application) without extracting
+    it: returns (manifest, entry point), or (None, None) after an error.
+    """
     if not zipfile.is_zipfile(filename):
         print(Fore.RED + "Error: Not a valid .mapp (zip) file")
-        return None, None, None
+        return None, None
 
     try:
         with zipfile.ZipFile(filename, 'r') as zf:
-            if "manifest.toml" not in zf.namelist():
-                print(Fore.RED + "Error: manifest.toml not found in .mapp")
-                return None, None, None
+            return read_zip_manifest(zf)
 
-            # Read manifest.toml
-            with zf.open("manifest.toml") as mf:
-                manifest = tomllib.load(mf)
+    except ValueError as e:
+        print(Fore.RED + f"Error: {e}")
+        return None, None
+    except Exception as e:
+        print(Fore.RED + f"Error parsing .mapp: {e}")
+        return None, None
 
-            entry_point = manifest["app"].get("entry_point", "main.py")
-            if entry_point not in zf.namelist():
-                print(Fore.RED + f"Error: Entry point '{entry_point}' not found in .mapp")
-                return None, None, None
 
-            # Extract entry point to a temp file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".py") as temp_file:
-                temp_file.write(zf.read(entry_point))
-                temp_path = temp_file.name
+def entry_point_module(entry):
+    """Module name for an entry point path: 'main.py' -> 'main', 'pkg/app.py' -> 'pkg.app'"""
+    if not entry.endswith(".py"):
+        return None
+    return entry[:-3].replace("\\", "/").strip("/").replace("/", ".")
 
-        return manifest, temp_path, entry_point
 
-    except Exception as e:
-        print(Fore.RED + f"Error parsing .mapp: {e}")
-        return None, None, None
+def clean_app_limits(limits):
+    """Keep the known, positive numeric [limits]; warn about the rest"""
+    cleaned = {}
+    for key, value in (limits or {}).items():
+        if key not in APP_LIMITS:
+            print(Fore.YELLOW + f"Warning: unknown limit '{key}' ignored")
+        elif isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            print(Fore.YELLOW + f"Warning: invalid value for limit '{key}' ignored")
+        else:
+            cleaned[key] = value
+    if cleaned and not hasattr(os, "wait4"):
+        print(Fore.YELLOW + "Warning: resource limits are not enforced on this platform")
+        return {}
+    return cleaned
+
+
+def describe_exit(returncode):
+    import signal
+    if returncode is None:
+        return "exited abnormally"
+    if returncode < 0:
+        try:
+            return f"killed by {signal.Signals(-returncode).name}"
+        except ValueError:
+            return f"killed by signal {-returncode}"
+    return f"exited with code {returncode}"
 
 
-def run_mapp(path):
+def print_app_report(result):
+    """Print exit status and resource usage of an app run"""
+    status = describe_exit(result["returncode"])
+    if result["returncode"] == 0:
+        print(Fore.GREEN + f"\n✓ Application {status}")
+    else:
+        print(Fore.RED + f"\n✗ Application {status}")
+    line = f"  Wall: {result['wall']:.2f}s"
+    usage = result.get("rusage")
+    if usage:
+        line += f"  CPU: {usage['utime']:.2f}s user, {usage['stime']:.2f}s sys"
+        line += f"  Max RSS: {usage['maxrss_kb'] / 1024:.1f} MB"
+        if usage.get("app_rss_kb") is not None:
+            line += f" ({usage['app_rss_kb'] / 1024:.1f} MB above the fork server's preload)"
+    print(Fore.CYAN + line)
+
+
+def log_app_metrics(username, path, meta, result, limits):
+    """Append one JSON line per app run to the user's metrics file"""
+    if not username:
+        return
+    record = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "app": meta.get("name", "Unknown"),
+        "version": meta.get("version"),
+        "path": os.path.abspath(path),
+        "returncode": result["returncode"],
+        "wall": round(result["wall"], 4),
+        "rusage": result.get("rusage"),
+        "limits": limits or None,
+    }
+    try:
+        with open(os.path.join(USERS_DIR, username, APP_METRICS_FILE), "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except Exception:
+        pass
+
+
+def prepare_mapp(path, from_zip=False):
     """
-    Run a Mirage Application (.mapp).
+    Read a .mapp's manifest and get its code ready to run.
     Supports:
     - Folder-based .mapp (manifest.toml + Python files)
     - Old-style .mapp (single file with [JSON]/[PY] sections)
-    - Packaged zip-based .mapp
-    Only runs after user confirms.
+    - Packaged zip-based .mapp, run from a private copy of its extraction
+      cache entry, or straight from the archive via zipimport with
+      from_zip / `zip_safe = true`
+    Returns a dict (script, module, is_temp, run_dir, interactive, meta, limits, dependencies),
+    or None after printing why the app can't run. Call discard_prepared_mapp()
+    when done with it.
     """
     temp_path = None
+    is_temp = False  # only old-style apps are written to a temp file
+    run_dir = None  # private copy a packaged app runs from
+    module = None
     manifest = None
     interactive = True
     meta = {}
+    limits = {}
+    dependencies = {}
 
     try:
         if os.path.isdir(path):
@@ -1007,7 +2159,7 @@ def run_mapp(path):
             manifest_path = os.path.join(path, "manifest.toml")
             if not os.path.exists(manifest_path):
                 print(Fore.RED + "manifest.toml not found in folder-based .mapp")
-                return
+                return None
 
             try:
                 import tomllib  # Python 3.11+
@@ -1021,17 +2173,19 @@ def run_mapp(path):
             temp_path = os.path.join(path, entry)
             if not os.path.exists(temp_path):
                 print(Fore.RED + f"Entry point '{entry}' not found in folder-based .mapp")
-                return
+                return None
 
             interactive = manifest["app"].get("interactive", True)
             meta = manifest.get("meta", {})
+            limits = manifest.get("limits", {})
+            dependencies = manifest.get("dependencies", {})
 
         elif zipfile.is_zipfile(path):
             # Zip-based
             with zipfile.ZipFile(path, "r") as zf:
                 if "manifest.toml" not in zf.namelist():
                     print(Fore.RED + "manifest.toml not found in packaged .mapp")
-                    return
+                    return None
 
                 try:
                     import tomllib
@@ -1044,18 +2198,21 @@ def run_mapp(path):
                 entry = manifest["app"].get("entry_point", "main.py")
                 if entry not in zf.namelist():
                     print(Fore.RED + f"Entry point '{entry}' not found in packaged .mapp")
-                    return
-
-                # Extract entry to temp file
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".py") as temp_file:
-                    temp_file.write(zf.read(entry))
-                    temp_path = temp_file.name
+                    return None
 
                 interactive = manifest["app"].get("interactive", True)
                 meta = manifest.get("meta", {})
+                limits = manifest.get("limits", {})
+                dependencies = manifest.get("dependencies", {})
 
-                # Warning for old .mapp versions
-                print(Fore.RED + f"Warning: This is an old version .mapp file (1.1-)")
+            if (from_zip or manifest["app"].get("zip_safe", False)) and entry_point_module(entry):
+                # Import straight from the archive: no extraction, no temp files
+                temp_path = path
+                module = entry_point_module(entry)
+            else:
+                # Run from a copy of the cached extraction so sibling modules are importable
+                run_dir = extract_mapp_cached(path)
+                temp_path = embedded_bytecode(os.path.join(run_dir, entry))
 
         else:
             # Old-style single-file .mapp
@@ -1069,7 +2226,9 @@ def run_mapp(path):
 
             if json_start == -1 or json_end == -1 or py_start == -1 or py_end == -1:
                 print(Fore.RED + "Invalid old-style .mapp format")
-                return
+                return None
+            # Warning for old .mapp versions
+            print(Fore.RED + "Warning: This is an old version .mapp file (1.1-), deprecated: convert it with 'mapp migrate'")
 
             json_str = content[json_start + 6 : json_end].strip()
             metadata = json.loads(json_str)
@@ -1078,15 +2237,60 @@ def run_mapp(path):
             with tempfile.NamedTemporaryFile(delete=False, suffix=".py") as temp_file:
                 temp_file.write(code.encode("utf-8"))
                 temp_path = temp_file.name
+                is_temp = True
 
             interactive = metadata.get("interactive", True)
             meta = metadata
+            limits = metadata.get("limits", {})
+            dependencies = metadata.get("dependencies", {})
+
+        dependency_requirements(dependencies)  # refuse bad names before anything runs
 
     except Exception as e:
         print(Fore.RED + f"Error preparing .mapp: {e}")
-        if temp_path and os.path.exists(temp_path):
+        if is_temp and os.path.exists(temp_path):
             os.remove(temp_path)
-        return
+        if run_dir:
+            shutil.rmtree(run_dir, ignore_errors=True)
+        return None
+
+    limits = clean_app_limits(limits)
+
+    return {
+        "path": path,
+        "script": temp_path,
+        "module": module,
+        "is_temp": is_temp,
+        "run_dir": run_dir,
+        "interactive": interactive,
+        "meta": meta,
+        "limits": limits,
+        "dependencies": dependencies,
+    }
+
+
+def discard_prepared_mapp(app):
+    """Remove the temp file an old-style app was written to, or a packaged app's private copy"""
+    if app["is_temp"] and os.path.exists(app["script"]):
+        os.remove(app["script"])
+    if app["run_dir"]:
+        shutil.rmtree(app["run_dir"], ignore_errors=True)
+
+
+def run_mapp(path, from_zip=False, username=None, log_file=None):
+    """
+    Run a Mirage Application (.mapp), see prepare_mapp() for the formats.
+    Only runs after user confirms. Exit status and resource usage are shown
+    afterwards and logged to the user's metrics file; [limits] are enforced.
+    Output of non-interactive apps is streamed live, and also appended to
+    log_file if given.
+    """
+    app = prepare_mapp(path, from_zip)
+    if app is None:
+        return
+    meta = app["meta"]
+    limits = app["limits"]
+    interactive = app["interactive"]
 
     # Show app info
     print(Fore.CYAN + "═" * 50)
@@ -1096,32 +2300,358 @@ def run_mapp(path):
         print(Fore.YELLOW + f" Author: {meta['author']}")
     if 'description' in meta:
         print(Fore.YELLOW + f" Description: {meta['description']}")
+    if limits:
+        print(Fore.YELLOW + " Limits: " + ", ".join(f"{k}={v}" for k, v in limits.items()))
+    if app["dependencies"]:
+        print(Fore.YELLOW + " Requires: " + ", ".join(dependency_requirements(app["dependencies"])))
     print(Fore.CYAN + "═" * 50)
 
     # Ask confirmation
     run_confirm = input(Fore.YELLOW + "Run this application? (yes/no): ").strip().lower()
     if run_confirm not in ['yes', 'y']:
         print(Fore.YELLOW + "Execution cancelled.")
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
+        discard_prepared_mapp(app)
         return
 
     # Run the application once
     print(Fore.GREEN + "\n▶ Running application...\n")
+    log = None
+    if log_file and interactive:
+        print(Fore.YELLOW + "Note: --log only records non-interactive apps; this one talks to the terminal directly.")
     try:
-        if interactive:
-            subprocess.run([sys.executable, temp_path])
-        else:
-            result = subprocess.run([sys.executable, temp_path], capture_output=True, text=True)
-            print(result.stdout)
-            if result.stderr:
-                print(Fore.RED + result.stderr)
-        print(Fore.GREEN + "\n✓ Application completed successfully")
+        if log_file and not interactive:
+            log = open(log_file, "a", encoding="utf-8")
+
+        def show_output(stream, text):
+            if stream == "stderr":
+                print(Fore.RED + text, end="", flush=True)
+            else:
+                print(text, end="", flush=True)
+            if log:
+                log.write(text)
+
+        python, env_lock = ensure_app_env(app["dependencies"])
+        try:
+            result = run_app_process(app["script"], interactive, app["module"], limits, show_output, python)
+        finally:
+            if env_lock:
+                env_lock.close()
+        print_app_report(result)
+        log_app_metrics(username, path, meta, result, limits)
     except Exception as e:
         print(Fore.RED + f"\n✗ Application error: {e}")
     finally:
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
+        if log:
+            log.close()
+            print(Fore.CYAN + f"  Output logged to {log_file}")
+        discard_prepared_mapp(app)
+
+def run_mapps_parallel(paths, jobs=None, assume_yes=False, username=None, from_zip=False, log_file=None):
+    """
+    Run several non-interactive .mapp apps at once, at most jobs at a time.
+    Output lines are prefixed with the app they came from (and appended to
+    log_file if given, prefixed the same way); a summary table of exit
+    statuses and durations is printed at the end.
+    """
+    import re
+    from concurrent.futures import ThreadPoolExecutor
+
+    jobs = jobs or os.cpu_count() or 1
+    line_pattern = re.compile(r"[^\r\n]*(?:\r\n|\n|\r)")
+    colors = [Fore.CYAN, Fore.MAGENTA, Fore.BLUE, Fore.YELLOW, Fore.GREEN]
+    apps = []
+    summary = []  # (label, status, result or None)
+
+    for path in paths:
+        label = os.path.basename(os.path.normpath(path))
+        if not os.path.exists(path):
+            print(Fore.RED + f"'{path}' not found, skipping.")
+            summary.append((label, "not found", None))
+            continue
+        app = prepare_mapp(path, from_zip)
+        if app is None:
+            summary.append((label, "invalid", None))
+            continue
+        if app["interactive"]:
+            print(Fore.YELLOW + f"'{label}' is interactive and can't run in parallel, skipping.")
+            summary.append((label, "skipped", None))
+            discard_prepared_mapp(app)
+            continue
+        if not assume_yes:
+            meta = app["meta"]
+            answer = input(Fore.YELLOW + f"Run {meta.get('name', label)} v{meta.get('version', '?')} ({label})? (yes/no): ").strip().lower()
+            if answer not in ["yes", "y"]:
+                summary.append((label, "cancelled", None))
+                discard_prepared_mapp(app)
+                continue
+        try:
+            app["python"], app["env_lock"] = ensure_app_env(app["dependencies"])
+        except Exception as e:
+            print(Fore.RED + f"Could not set up the environment for '{label}': {e}")
+            summary.append((label, "env failed", None))
+            discard_prepared_mapp(app)
+            continue
+        app["label"] = label
+        app["color"] = colors[len(apps) % len(colors)]
+        apps.append(app)
+
+    log = None
+    if apps:
+        width = max(len(app["label"]) for app in apps)
+        print(Fore.GREEN + f"\n▶ Running {len(apps)} application(s), {min(jobs, len(apps))} at a time...\n")
+        print_lock = threading.Lock()
+
+        def run_one(app):
+            prefix = app["color"] + f"[{app['label']:<{width}}] " + Fore.WHITE
+            err_prefix = app["color"] + f"[{app['label']:<{width}}] " + Fore.RED
+            partial = {"stdout": "", "stderr": ""}  # unfinished line per stream
+
+            def write_lines(stream, lines):
+                lead = err_prefix if stream == "stderr" else prefix
+                with print_lock:
+                    print("".join(lead + line for line in lines), end="", flush=True)
+                    if log:
+                        log.write("".join(f"[{app['label']}] {line}" for line in lines))
+
+            def show_output(stream, text):
+                # Only whole lines get a prefix; the rest waits for its line end
+                buf = partial[stream] + text
+                lines = line_pattern.findall(buf)
+                rest = buf[sum(len(line) for line in lines):]
+                if len(rest) >= STREAM_MAX_LINE:
+                    lines.append(rest + "\n")  # a very long line: pass it on in pieces
+                    rest = ""
+                partial[stream] = rest
+                if lines:
+                    write_lines(stream, lines)
+
+            try:
+                return run_app_process(app["script"], False, app["module"], app["limits"], show_output, app["python"])
+            finally:
+                for stream, rest in partial.items():
+                    if rest:  # output the app ended without a newline
+                        write_lines(stream, [rest + "\n"])
+                if app["env_lock"]:
+                    app["env_lock"].close()
+                discard_prepared_mapp(app)
+
+        if log_file:
+            try:
+                log = open(log_file, "a", encoding="utf-8")
+            except OSError as e:
+                print(Fore.RED + f"Can't open log '{log_file}': {e}")
+        try:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                futures = [(app, pool.submit(run_one, app)) for app in apps]
+                for app, future in futures:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        summary.append((app["label"], f"error: {e}", None))
+                        continue
+                    log_app_metrics(username, app["path"], app["meta"], result, app["limits"])
+                    summary.append((app["label"], describe_exit(result["returncode"]), result))
+        finally:
+            if log:
+                log.close()
+                print(Fore.CYAN + f"  Output logged to {log_file}")
+
+    # Summary table
+    with batched_output():
+        print(Fore.CYAN + "\n" + "═" * 72)
+        print(Fore.CYAN + f" {'App':<24} {'Status':<22} {'Wall':>7} {'CPU':>7} {'Max RSS':>9}")
+        print(Fore.CYAN + "═" * 72)
+        failed = 0
+        for label, status, result in summary:
+            ok = result is not None and result["returncode"] == 0
+            failed += not ok
+            wall = cpu = rss = ""
+            if result is not None:
+                wall = f"{result['wall']:.2f}s"
+                if result.get("rusage"):
+                    usage = result["rusage"]
+                    cpu = f"{usage['utime'] + usage['stime']:.2f}s"
+                    rss = f"{usage['maxrss_kb'] / 1024:.1f} MB"
+            color = Fore.GREEN if ok else Fore.RED
+            print(color + f" {label[:24]:<24} {status[:22]:<22} {wall:>7} {cpu:>7} {rss:>9}")
+        print(Fore.CYAN + "═" * 72)
+        print((Fore.GREEN if not failed else Fore.RED) + f" {len(summary) - failed} succeeded, {failed} failed")
+
+
+# ---------- App Dependency Environments ----------
+# Apps list what they need under [dependencies] in manifest.toml. Each
+# distinct set (plus the interpreter it is built for) gets one virtual
+# environment in APP_ENVS_DIR/<hash>, shared by every app with the same set.
+# Environments see Mirage's own packages (colorama, ...) through
+# --system-site-packages and are removed after APP_ENV_MAX_IDLE of disuse.
+APP_ENV_READY_FILE = ".mirage-ready"
+APP_ENV_MAX_IDLE = 30 * 24 * 60 * 60  # seconds
+# A PEP 508 project name, optionally with extras: "requests", "uvicorn[standard]"
+DEPENDENCY_NAME_PATTERN = r"[A-Za-z0-9]([A-Za-z0-9._-]*[A-Za-z0-9])?(\[[A-Za-z0-9._, -]*\])?"
+
+
+def dependency_requirements(dependencies):
+    """
+    Turn a [dependencies] table into sorted pip requirement strings.
+    Raises ValueError for a name that isn't a valid package name.
+    """
+    import re
+    requirements = []
+    for name, spec in (dependencies or {}).items():
+        if not re.fullmatch(DEPENDENCY_NAME_PATTERN, name):
+            raise ValueError(f"invalid dependency name '{name}'")
+        spec = str(spec).strip()
+        if spec in ("", "*"):
+            requirements.append(name)
+        elif spec[0] in "<>=!~":
+            requirements.append(name + spec)
+        else:
+            requirements.append(f"{name}=={spec}")
+    return sorted(requirements, key=str.lower)
+
+
+def app_env_key(requirements):
+    h = hashlib.sha256()
+    h.update(os.path.realpath(sys.executable).encode("utf-8"))
+    h.update(sys.implementation.cache_tag.encode("utf-8"))
+    for requirement in requirements:
+        h.update(b"\0" + requirement.lower().encode("utf-8"))
+    return h.hexdigest()[:20]
+
+
+def app_env_python(env_dir):
+    if platform.system() == "Windows":
+        return os.path.join(env_dir, "Scripts", "python.exe")
+    return os.path.join(env_dir, "bin", "python")
+
+
+def lock_app_env(lock, operation):
+    """flock() an environment's lock file ("LOCK_SH", "LOCK_EX", ...); a no-op without fcntl"""
+    try:
+        import fcntl
+    except ImportError:
+        return
+    flags = 0
+    for name in operation.split("|"):
+        flags |= getattr(fcntl, name)
+    fcntl.flock(lock, flags)
+
+
+def ensure_app_env(dependencies):
+    """
+    Return (interpreter, lock) for the environment of a [dependencies]
+    table, creating it (once, under a lock shared with other sessions) if
+    needed. lock is an open file holding a shared lock on the environment,
+    which keeps gc_app_envs() from removing it: close it once the app has
+    finished. Returns (None, None) if there are no dependencies; raises on
+    an invalid dependency or an install failure.
+    """
+    requirements = dependency_requirements(dependencies)
+    if not requirements:
+        return None, None
+    env_dir = os.path.join(APP_ENVS_DIR, app_env_key(requirements))
+    ready_file = os.path.join(env_dir, APP_ENV_READY_FILE)
+
+    os.makedirs(APP_ENVS_DIR, exist_ok=True)
+    ensure_hidden(APP_ENVS_DIR)
+    lock = open(env_dir + ".lock", "a")
+    try:
+        lock_app_env(lock, "LOCK_SH")
+        if not os.path.exists(ready_file):
+            lock_app_env(lock, "LOCK_EX")  # another session may be building it
+            if not os.path.exists(ready_file):
+                import venv
+                print(Fore.CYAN + "Setting up app environment: " + ", ".join(requirements))
+                shutil.rmtree(env_dir, ignore_errors=True)  # half-built by a session that died
+                venv.create(env_dir, system_site_packages=True, with_pip=True)
+                subprocess.run(
+                    [app_env_python(env_dir), "-m", "pip", "install", "--disable-pip-version-check",
+                     "--", *requirements],
+                    check=True
+                )
+                with open(ready_file, "w") as f:
+                    f.write("\n".join(requirements))
+                print(Fore.GREEN + "✓ Environment ready")
+                gc_app_envs()
+            lock_app_env(lock, "LOCK_SH")
+        os.utime(ready_file)  # last-used time, for garbage collection
+    except BaseException:
+        lock.close()
+        raise
+    return app_env_python(env_dir), lock
+
+
+def list_app_envs():
+    """[(key, requirements, last used)] of the ready environments"""
+    envs = []
+    try:
+        names = os.listdir(APP_ENVS_DIR)
+    except OSError:
+        return envs
+    for name in names:
+        ready_file = os.path.join(APP_ENVS_DIR, name, APP_ENV_READY_FILE)
+        try:
+            with open(ready_file, "r") as f:
+                requirements = f.read().splitlines()
+            envs.append((name, requirements, os.stat(ready_file).st_mtime))
+        except OSError:
+            continue
+    return sorted(envs, key=lambda e: e[2])
+
+
+def gc_app_envs(max_idle=APP_ENV_MAX_IDLE):
+    """
+    Delete environments no app has used for max_idle seconds, skipping any
+    a session holds the lock of (running an app, or installing); returns
+    how many. Lock files are kept: another session may be waiting on one.
+    """
+    removed = 0
+    now = time.time()
+    for name, _, used in list_app_envs():
+        if now - used <= max_idle:
+            continue
+        env_dir = os.path.join(APP_ENVS_DIR, name)
+        try:
+            lock = open(env_dir + ".lock", "a")
+        except OSError:
+            continue
+        with lock:
+            try:
+                lock_app_env(lock, "LOCK_EX|LOCK_NB")
+            except BlockingIOError:
+                continue  # in use
+            try:
+                os.remove(os.path.join(env_dir, APP_ENV_READY_FILE))  # not ready while half-removed
+            except OSError:
+                continue
+            shutil.rmtree(env_dir, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def manage_app_envs(args):
+    """Handle 'mapp env [list|gc [DAYS]]'"""
+    if not args or args[0] == "list":
+        envs = list_app_envs()
+        if not envs:
+            print(Fore.YELLOW + "No app environments yet.")
+            return
+        print(Fore.CYAN + "App environments:")
+        for name, requirements, used in reversed(envs):
+            last = datetime.fromtimestamp(used).strftime('%Y-%m-%d %H:%M')
+            print(Fore.YELLOW + f"  {name} " + Fore.WHITE + f"(last used {last})")
+            print(Fore.WHITE + "    " + ", ".join(requirements))
+    elif args[0] == "gc":
+        try:
+            days = float(args[1]) if len(args) > 1 else APP_ENV_MAX_IDLE / 86400
+        except ValueError:
+            print(Fore.RED + "Usage: mapp env gc [DAYS]")
+            return
+        removed = gc_app_envs(days * 86400)
+        print(Fore.GREEN + f"✓ Removed {removed} unused environment(s)")
+    else:
+        print(Fore.RED + "Unknown subcommand. Use: list, gc")
+
 
 def create_mapp_template(foldername):
     """Create a folder-based .mapp template"""
@@ -1149,6 +2679,15 @@ description = "A simple Mirage application"
 [app]
 entry_point = "main.py"
 interactive = true
+# zip_safe = true  # run straight from the packaged archive instead of extracting it
+
+# [dependencies]
+# requests = ">=2.0"
+
+# [limits]
+# cpu_seconds = 60
+# address_space_mb = 1024
+# open_files = 256
 """
     with open(os.path.join(foldername, "manifest.toml"), 'w', encoding='utf-8') as f:
         f.write(manifest)
@@ -1184,92 +2723,733 @@ def greet_user(name):
     print(Fore.CYAN + f"Edit the files inside {foldername} and once youre ready to distrubute run mapp package {foldername}.")
 
 
-def list_mapps(directory):
-    """List all .mapp files in a directory"""
-    files = [f for f in os.listdir(directory) if f.endswith(".mapp")]
-    if not files:
+MAPP_META_PREFIX = 8192  # bytes read (or requested over HTTP) to find an app's metadata
+
+
+def manifest_from_prefix(data):
+    """
+    Parse manifest.toml from the first bytes of a .mapp archive, which works
+    when it is the first entry (as 'mapp package' writes it). Returns None
+    if it isn't there or doesn't fit in the prefix.
+    """
+    import struct
+    import zlib
+    if len(data) < 30 or data[:4] != b"PK\x03\x04":
+        return None
+    flags, method = struct.unpack_from("<2H", data, 6)
+    packed_size, _, name_len, extra_len = struct.unpack_from("<2L2H", data, 18)
+    start = 30 + name_len + extra_len
+    if data[30:30 + name_len] != b"manifest.toml" or flags & 0x9 or len(data) < start + packed_size:
+        return None
+    packed = data[start:start + packed_size]
+    if method == 8:
+        packed = zlib.decompress(packed, -15)
+    elif method != 0:
+        return None
+    return tomllib.loads(packed.decode("utf-8"))
+
+
+def mapp_meta_from_prefix(data):
+    """[meta] of an app from the first bytes of its file (packaged or old-style), or None"""
+    manifest = manifest_from_prefix(data)
+    if manifest is not None:
+        return manifest.get("meta", {})
+    json_start = data.find(b"[JSON]")
+    json_end = data.find(b"[JSONEND]")
+    if json_start == -1 or json_end == -1:
+        return None
+    return json.loads(data[json_start + 6 : json_end].strip())
+
+
+def read_mapp_meta(path):
+    """
+    Read just the [meta] table of a .mapp (folder, zip or old-style file)
+    without extracting anything. Returns None if it isn't a valid app.
+    """
+    try:
+        if os.path.isdir(path):
+            with open(os.path.join(path, "manifest.toml"), "rb") as f:
+                return tomllib.load(f).get("meta", {})
+        with open(path, "rb") as f:
+            meta = mapp_meta_from_prefix(f.read(MAPP_META_PREFIX))
+        if meta is not None:
+            return meta
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path, "r") as zf:
+                with zf.open("manifest.toml") as f:
+                    return tomllib.load(f).get("meta", {})
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        json_start = content.find("[JSON]")
+        json_end = content.find("[JSONEND]")
+        if json_start == -1 or json_end == -1:
+            return None
+        return json.loads(content[json_start + 6 : json_end].strip())
+    except Exception:
+        return None
+
+
+def load_mapp_index():
+    try:
+        with open(MAPP_INDEX_FILE, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def save_mapp_index(index):
+    tmp_path = MAPP_INDEX_FILE + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, MAPP_INDEX_FILE)
+
+
+def find_mapps(directory):
+    """Paths of the apps in a directory: *.mapp files and folders with a manifest.toml"""
+    found = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.startswith("."):
+                continue
+            if entry.name.endswith(".mapp"):
+                found.append(entry.path)
+            elif entry.is_dir() and os.path.exists(os.path.join(entry.path, "manifest.toml")):
+                found.append(entry.path)
+    return sorted(found)
+
+
+def index_mapps(directories):
+    """
+    Return [(path, meta)] for the apps in the given directories, reusing the
+    persistent index for anything whose mtime and size haven't changed and
+    parsing the rest in parallel.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    index = load_mapp_index()
+    results = {}
+    stale = []
+    scanned = set()
+    removed = False
+    for directory in directories:
+        directory = os.path.abspath(os.path.expanduser(directory))
+        try:
+            paths = find_mapps(directory)
+        except OSError as e:
+            print(Fore.RED + f"Cannot read '{directory}': {e}")
+            continue
+        for path in paths:
+            scanned.add(path)
+            try:
+                # Folder apps are keyed on their manifest, which is what we read
+                st = os.stat(os.path.join(path, "manifest.toml") if os.path.isdir(path) else path)
+            except OSError:
+                continue
+            cached = index.get(path)
+            if cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size:
+                results[path] = cached["meta"]
+            else:
+                stale.append((path, st))
+        # Forget apps that disappeared from this directory
+        for path in [p for p in index if os.path.dirname(p) == directory and p not in scanned]:
+            del index[path]
+            removed = True
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as pool:
+            metas = pool.map(read_mapp_meta, [path for path, _ in stale])
+            for (path, st), meta in zip(stale, metas):
+                results[path] = meta
+                index[path] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "meta": meta}
+    if stale or removed:
+        try:
+            save_mapp_index(index)
+        except Exception:
+            pass
+
+    return sorted(results.items())
+
+
+def list_mapps(directories=None):
+    """List the .mapp apps in the given directories (default: current directory)"""
+    apps = index_mapps(directories or ["."])
+    if not apps:
         print(Fore.YELLOW + "No .mapp files found.")
         return
-    print(Fore.CYAN + "Available .mapps:")
-    for f in files:
-        print(Fore.GREEN + f" - {f}")
 
-    """List all .mapp files in current directory"""
-    mapps = [f for f in os.listdir('.') if f.endswith('.mapp')]
-    
-    if not mapps:
-        print(Fore.YELLOW + "No .mapp files found in current directory.")
-        return
-    
-    print(Fore.CYAN + "═" * 50)
-    print(Fore.CYAN + "Mirage Applications (.mapp files):")
-    print(Fore.CYAN + "═" * 50)
-    
-    for mapp_file in sorted(mapps):
-        metadata, _ = parse_mapp_file(mapp_file)
-        if metadata:
-            name = metadata.get('name', 'Unknown')
-            version = metadata.get('version', '?')
-            print(Fore.BLUE + f"  {mapp_file}")
+    with batched_output():
+        print(Fore.CYAN + "═" * 50)
+        print(Fore.CYAN + "Mirage Applications (.mapp files):")
+        print(Fore.CYAN + "═" * 50)
+        for path, meta in apps:
+            shown = os.path.relpath(path) if not directories else path
+            print(Fore.BLUE + f"  {shown}")
+            if meta is None:
+                print(Fore.RED + "   (invalid .mapp)")
+                print()
+                continue
+            name = meta.get('name', 'Unknown')
+            version = meta.get('version', '?')
             print(Fore.YELLOW + f"   {name} " + Fore.WHITE + f"v{version}")
-            if 'description' in metadata:
-                print(Fore.WHITE + f"   {metadata['description']}")
+            if meta.get('author'):
+                print(Fore.WHITE + f"   by {meta['author']}")
+            if 'description' in meta:
+                print(Fore.WHITE + f"   {meta['description']}")
             print()
+        print(Fore.CYAN + f"{len(apps)} app(s)")
+
+# ---------- .mapp Packaging ----------
+# Packages are written by a small ZIP writer of our own so that builds are
+# reproducible (fixed timestamps, sorted entries, normalised permissions) and
+# so compressed entries from the previous build can be copied over verbatim
+# for files whose content (CRC-32 + size) hasn't changed.
+PACKAGE_DEFAULT_LEVEL = 6
+PACKAGE_IGNORE = ["__pycache__", "*.pyc", ".git", ".DS_Store", "*.mapp", ".mappignore"]
+PACKAGE_DOS_TIME = 0  # 00:00:00
+PACKAGE_DOS_DATE = (0 << 9) | (1 << 5) | 1  # 1980-01-01, the earliest ZIP date
+PACKAGE_COMMENT_PREFIX = b"mirage-mapp level="
+
+
+def package_comment(level, optimize=0):
+    """Archive comment recording the compression level (and bytecode optimization, if any)"""
+    comment = PACKAGE_COMMENT_PREFIX + str(level).encode()
+    if optimize:
+        comment += b" optimize=" + str(optimize).encode()
+    return comment
+
+
+def package_optimize(comment):
+    """The optimization level of the bytecode in an archive with this comment"""
+    if not comment.startswith(PACKAGE_COMMENT_PREFIX):
+        return 0
+    for field in comment.split()[1:]:
+        if field.startswith(b"optimize=") and field[9:] in (b"1", b"2"):
+            return int(field[9:])
+    return 0
+
+
+def load_package_ignore(folder_path, extra=()):
+    patterns = list(PACKAGE_IGNORE) + list(extra)
+    ignore_file = os.path.join(folder_path, ".mappignore")
+    if os.path.exists(ignore_file):
+        with open(ignore_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    patterns.append(line.rstrip("/"))
+    return patterns
+
+
+def is_package_ignored(rel_path, patterns):
+    import fnmatch
+    name = rel_path.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatch(rel_path, p) or fnmatch.fnmatch(name, p) for p in patterns)
+
+
+def collect_package_files(folder_path, patterns):
+    """Sorted (archive name, absolute path) pairs of the files to package"""
+    found = []
+    for root, dirs, files in os.walk(folder_path):
+        rel_root = os.path.relpath(root, folder_path).replace(os.sep, "/")
+        rel_root = "" if rel_root == "." else rel_root + "/"
+        dirs[:] = [d for d in dirs if not is_package_ignored(rel_root + d, patterns)]
+        for f in files:
+            if not is_package_ignored(rel_root + f, patterns):
+                found.append((rel_root + f, os.path.join(root, f)))
+    return sorted(found)
+
+
+def load_reusable_entries(archive_path, level):
+    """
+    Map (crc32, size) -> (method, offset, length) of the compressed bytes
+    of the entries of a previous build made with the same compression level.
+    The bytes themselves are read (and checked) by reuse_package_entry().
+    """
+    import struct
+    reusable = {}
+    if not os.path.exists(archive_path) or not zipfile.is_zipfile(archive_path):
+        return reusable
+    try:
+        with zipfile.ZipFile(archive_path, "r") as zf, open(archive_path, "rb") as raw:
+            if zf.comment.split()[:2] != package_comment(level).split():
+                return reusable
+            for info in zf.infolist():
+                if info.flag_bits & 0x9:  # encrypted or trailing data descriptor
+                    continue
+                raw.seek(info.header_offset)
+                header = raw.read(30)
+                if header[:4] != b"PK\x03\x04":
+                    continue
+                name_len, extra_len = struct.unpack("<HH", header[26:30])
+                if info.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                    reusable[(info.CRC, info.file_size)] = (
+                        info.compress_type, info.header_offset + 30 + name_len + extra_len, info.compress_size)
+    except Exception:
+        return {}
+    return reusable
+
+
+def reuse_package_entry(archive_path, location, data):
+    """
+    The compressed bytes at location (from load_reusable_entries) if they
+    decompress to exactly data, else None: equal CRCs don't prove equal content.
+    """
+    import zlib
+    method, offset, length = location
+    try:
+        with open(archive_path, "rb") as raw:
+            raw.seek(offset)
+            packed = raw.read(length)
+        unpacked = zlib.decompress(packed, -15) if method == zipfile.ZIP_DEFLATED else packed
+    except (OSError, zlib.error):
+        return None
+    return packed if unpacked == data else None
+
+
+def compress_package_data(data, level):
+    """Compress one entry; returns (method, compressed bytes)"""
+    import zlib
+    if level == 0:
+        return zipfile.ZIP_STORED, data
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    packed = compressor.compress(data) + compressor.flush()
+    if len(packed) >= len(data):
+        return zipfile.ZIP_STORED, data
+    return zipfile.ZIP_DEFLATED, packed
+
+
+def compile_package_bytecode(source, arcname, optimize=0):
+    """
+    Compile a module to .pyc bytes for this interpreter. The pyc is
+    hash-based and unchecked (PEP 552), so it stays valid inside an archive
+    whose timestamps are fixed.
+    """
+    import struct
+    import marshal
+    import importlib.util
+    code = compile(source, arcname, "exec", dont_inherit=True, optimize=optimize)
+    return (importlib.util.MAGIC_NUMBER + struct.pack("<I", 0b01)
+            + importlib.util.source_hash(source) + marshal.dumps(code))
+
+
+def package_mapp(folder_path, output_file, level=PACKAGE_DEFAULT_LEVEL, ignore=(), pyc=False, optimize=0):
+    """
+    Build a reproducible .mapp from a folder, reusing unchanged entries of
+    the existing output file and compressing the rest in parallel.
+    With pyc, a compiled NAME.pyc is stored next to every NAME.py.
+    manifest.toml is always the first, uncompressed entry (see
+    manifest_from_prefix()). Returns a stats dict.
+    """
+    import struct
+    import zlib
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    files = collect_package_files(folder_path, load_package_ignore(folder_path, ignore))
+    if pyc:
+        sources = {name for name, _ in files}
+        files += [(name + "c", path) for name, path in files
+                  if name.endswith(".py") and name + "c" not in sources]
+    # manifest.toml goes first, stored, so metadata can be read from a prefix of the file
+    files.sort(key=lambda item: (item[0] != "manifest.toml", item[0]))
+    if len(files) > 0xFFFF:
+        raise ValueError("too many files for a .mapp (max 65535)")
+    reusable = load_reusable_entries(output_file, level)
+    stats = {"files": 0, "reused": 0, "compressed": 0, "stored": 0, "bytecode": 0, "skipped": [],
+             "original": 0, "packed": 0}
+
+    def build_entry(item):
+        name, path = item
+        with open(path, "rb") as f:
+            data = f.read()
+        if pyc and name.endswith(".pyc") and not path.endswith(".pyc"):
+            try:
+                data = compile_package_bytecode(data, name[:-1], optimize)
+            except (SyntaxError, ValueError):
+                return None  # leave it to the source at run time
+        crc = zlib.crc32(data)
+        if name == "manifest.toml":
+            return crc, len(data), 0, data, False
+        if (crc, len(data)) in reusable:
+            packed = reuse_package_entry(output_file, reusable[(crc, len(data))], data)
+            if packed is not None:
+                return crc, len(data), reusable[(crc, len(data))][0], packed, True
+        return (crc, len(data), *compress_package_data(data, level), False)
+
+    def write_entry(out, name, path, built):
+        if built is None:
+            stats["skipped"].append(name[:-1])
+            return
+        crc, size, method, packed, reused = built
+        if size > 0xFFFFFFFF or out.tell() > 0xFFFFFFFF:
+            raise ValueError(f"'{name}' is too large for a .mapp (max 4 GB)")
+        encoded = name.encode("utf-8")
+        mode = 0o755 if os.access(path, os.X_OK) else 0o644
+        offset = out.tell()
+        out.write(struct.pack(
+            "<4s5H3L2H", b"PK\x03\x04", 20, 0x800, method,
+            PACKAGE_DOS_TIME, PACKAGE_DOS_DATE, crc, len(packed), size, len(encoded), 0
+        ))
+        out.write(encoded)
+        out.write(packed)
+        central.append(struct.pack(
+            "<4s6H3L5H2L", b"PK\x01\x02", (3 << 8) | 20, 20, 0x800, method,
+            PACKAGE_DOS_TIME, PACKAGE_DOS_DATE, crc, len(packed), size,
+            len(encoded), 0, 0, 0, 0, ((0o100000 | mode) << 16), offset
+        ) + encoded)
+        stats["files"] += 1
+        if reused:
+            stats["reused"] += 1
+        elif method == zipfile.ZIP_DEFLATED:
+            stats["compressed"] += 1
+        else:
+            stats["stored"] += 1  # manifest.toml, level 0, or didn't shrink
+        stats["bytecode"] += name.endswith(".pyc")
+        stats["original"] += size
+
+    tmp_path = output_file + f".{os.getpid()}.tmp"
+    central = []
+    workers = os.cpu_count() or 1
+    try:
+        with open(tmp_path, "wb") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+            # Written in submission order, so the archive layout stays deterministic;
+            # at most 2 * workers built entries are held in memory at once
+            pending = deque()
+            for name, path in files:
+                pending.append((name, path, pool.submit(build_entry, (name, path))))
+                if len(pending) >= 2 * workers:
+                    name, path, future = pending.popleft()
+                    write_entry(out, name, path, future.result())
+            while pending:
+                name, path, future = pending.popleft()
+                write_entry(out, name, path, future.result())
+
+            cd_offset = out.tell()
+            for record in central:
+                out.write(record)
+            comment = package_comment(level, optimize if pyc else 0)
+            out.write(struct.pack(
+                "<4s4H2LH", b"PK\x05\x06", 0, 0, len(central), len(central),
+                out.tell() - cd_offset, cd_offset, len(comment)
+            ))
+            out.write(comment)
+            stats["packed"] = out.tell()
+        os.replace(tmp_path, output_file)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return stats
+
 
 def package_mapp_command(parts):
     """
-    Handles the 'mapp package <dir>' command
+    Handles the 'mapp package <dir> [-o FILE] [--level N] [--ignore PATTERN]... [--pyc [--optimize N]]' command
     parts: list of command parts, e.g., ["mapp", "package", "MyApp"]
     """
+    usage = "Usage: mapp package <dir> [-o FILE] [--level 0-9] [--ignore PATTERN]... [--pyc [--optimize 0-2]]"
     if len(parts) < 3:
-        print(Fore.RED + "Usage: mapp package <dir>")
+        print(Fore.RED + usage)
         return
 
     folder_path = parts[2]
+    output_file = None
+    level = PACKAGE_DEFAULT_LEVEL
+    ignore = []
+    pyc = False
+    optimize = 0
+    args = parts[3:]
+    try:
+        while args:
+            flag = args.pop(0)
+            if flag in ("-o", "--output"):
+                output_file = args.pop(0)
+            elif flag == "--level":
+                level = int(args.pop(0))
+                if not 0 <= level <= 9:
+                    raise ValueError
+            elif flag == "--ignore":
+                ignore.append(args.pop(0))
+            elif flag == "--pyc":
+                pyc = True
+            elif flag == "--optimize":
+                optimize = int(args.pop(0))
+                if not 0 <= optimize <= 2:
+                    raise ValueError
+            else:
+                print(Fore.RED + f"Unknown option: {flag}")
+                print(Fore.RED + usage)
+                return
+    except (IndexError, ValueError):
+        print(Fore.RED + usage)
+        return
 
     if not os.path.isdir(folder_path):
         print(Fore.RED + f"Folder not found: {folder_path}")
         return
 
     # Name of the output .mapp file
-    folder_name = os.path.basename(folder_path.rstrip("/\\"))
-    output_file = folder_name + ".mapp"
+    if output_file is None:
+        folder_name = os.path.basename(folder_path.rstrip("/\\"))
+        output_file = folder_name + ".mapp"
 
     try:
-        with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for root, dirs, files in os.walk(folder_path):
-                for f in files:
-                    abs_path = os.path.join(root, f)
-                    # Store relative path in the zip
-                    rel_path = os.path.relpath(abs_path, folder_path)
-                    zf.write(abs_path, rel_path)
-
-        print(Fore.GREEN + f"✓ Successfully packaged '{folder_path}' → '{output_file}'")
+        started = time.perf_counter()
+        stats = package_mapp(folder_path, output_file, level, ignore, pyc, optimize)
+        elapsed = time.perf_counter() - started
     except Exception as e:
         print(Fore.RED + f"Error packaging .mapp: {e}")
-    """Package a folder-based .mapp into a zip with .mapp extension"""
-    if not os.path.isdir(folder_path):
-        print(Fore.RED + f"Folder not found: {folder_path}")
         return
 
-    # Determine output .mapp file name
-    folder_name = os.path.basename(folder_path.rstrip("/\\"))
-    output_file = folder_name + ".mapp"
+    ratio = (stats["packed"] / stats["original"] * 100) if stats["original"] else 100
+    print(Fore.GREEN + f"✓ Successfully packaged '{folder_path}' → '{output_file}'")
+    print(Fore.CYAN + f"  Files:    {stats['files']} ({stats['reused']} reused, {stats['compressed']} compressed, {stats['stored']} stored)")
+    print(Fore.CYAN + f"  Size:     {stats['original']:,} → {stats['packed']:,} bytes ({ratio:.1f}%)")
+    print(Fore.CYAN + f"  Level:    {level}")
+    if pyc:
+        print(Fore.CYAN + f"  Bytecode: {stats['bytecode']} module(s) for Python {platform.python_version()} (optimize={optimize})")
+        for name in stats["skipped"]:
+            print(Fore.YELLOW + f"  Warning: '{name}' does not compile, shipping source only")
+    print(Fore.CYAN + f"  Time:     {elapsed * 1000:.0f} ms")
+
+# ---------- .mapp Validation ----------
+CHECK_MAX_ENTRY_BYTES = 64 * 1024 * 1024  # larger entries are reported as oversized
+
 
-    # Create zip
+def check_python_source(name, source, problems):
     try:
-        with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for root, dirs, files in os.walk(folder_path):
-                for f in files:
-                    abs_path = os.path.join(root, f)
-                    rel_path = os.path.relpath(abs_path, folder_path)
-                    zf.write(abs_path, rel_path)
-        print(Fore.GREEN + f"✓ Packaged '{folder_path}' → '{output_file}'")
+        compile(source, name, "exec", dont_inherit=True)
+    except SyntaxError as e:
+        problems.append(f"{name}:{e.lineno}: {e.msg}")
+    except ValueError as e:  # e.g. null bytes
+        problems.append(f"{name}: {e}")
+
+
+def check_mapp(path):
+    """
+    Validate one app without running or extracting it: the manifest parses,
+    the entry point exists, every Python source compiles, and no entry is
+    oversized or duplicated. Returns (problems, warnings); the app is valid
+    when problems is empty.
+    """
+    problems = []
+    warnings = []
+    try:
+        if os.path.isdir(path):
+            files = collect_package_files(path, load_package_ignore(path))
+            names = [name for name, _ in files]
+            try:
+                with open(os.path.join(path, "manifest.toml"), "rb") as f:
+                    manifest = tomllib.load(f)
+                if "app" not in manifest:
+                    problems.append("manifest.toml has no [app] table")
+                else:
+                    entry = manifest["app"].get("entry_point", "main.py")
+                    if entry not in names:
+                        problems.append(f"Entry point '{entry}' not found")
+            except (OSError, ValueError) as e:
+                problems.append(f"Bad manifest.toml: {e}")
+            for name, full_path in files:
+                size = os.path.getsize(full_path)
+                if size > CHECK_MAX_ENTRY_BYTES:
+                    problems.append(f"{name}: oversized ({size:,} bytes)")
+                elif name.endswith(".py"):
+                    with open(full_path, "rb") as f:
+                        check_python_source(name, f.read(), problems)
+
+        elif zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path, "r") as zf:
+                try:
+                    read_zip_manifest(zf)
+                except ValueError as e:
+                    problems.append(str(e))
+                seen = set()
+                for info in zf.infolist():
+                    if info.filename in seen:
+                        problems.append(f"{info.filename}: duplicate entry")
+                        continue
+                    seen.add(info.filename)
+                    if info.file_size > CHECK_MAX_ENTRY_BYTES:
+                        problems.append(f"{info.filename}: oversized ({info.file_size:,} bytes)")
+                    elif info.filename.endswith(".py"):
+                        check_python_source(info.filename, zf.read(info), problems)
+
+        else:
+            # Still runnable, but deprecated: check it like run_mapp() reads it
+            warnings.append("Legacy [JSON]/[PY] single-file app (deprecated, convert it with 'mapp migrate')")
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+            json_start, json_end = content.find("[JSON]"), content.find("[JSONEND]")
+            py_start, py_end = content.find("[PY]"), content.find("[PYEND]")
+            if -1 in (json_start, json_end, py_start, py_end):
+                problems.append("Invalid old-style .mapp format")
+            else:
+                try:
+                    json.loads(content[json_start + 6 : json_end].strip())
+                except ValueError as e:
+                    problems.append(f"Bad [JSON] section: {e}")
+                check_python_source("[PY]", content[py_start + 4 : py_end].strip().encode("utf-8"), problems)
     except Exception as e:
-        print(Fore.RED + f"Error packaging .mapp: {e}")
+        problems.append(f"Cannot read: {e}")
+    return problems, warnings
+
+
+def check_mapps(args):
+    """
+    Handle 'mapp check [DIR|FILE...]': validate apps in parallel, print the
+    failures and return the exit status (0 if every app is valid).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    paths = []
+    for arg in args or ["."]:
+        if os.path.isdir(arg) and not os.path.exists(os.path.join(arg, "manifest.toml")):
+            try:
+                paths.extend(find_mapps(arg))
+            except OSError as e:
+                print(Fore.RED + f"Cannot read '{arg}': {e}")
+                return 1
+        elif os.path.exists(arg):
+            paths.append(arg)
+        else:
+            print(Fore.RED + f"'{arg}' not found")
+            return 1
+    if not paths:
+        print(Fore.YELLOW + "No .mapp files found.")
+        return 0
+
+    started = time.perf_counter()
+    if len(paths) < 8:
+        results = [check_mapp(path) for path in paths]
+    else:
+        # Threads overlap the zip and file reads; worker processes would
+        # re-import mirage.py (spawn) or fork the REPL's background threads
+        workers = min(os.cpu_count() or 1, len(paths), 8)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(check_mapp, paths))
+    elapsed = time.perf_counter() - started
+
+    failed = warned = 0
+    with batched_output():
+        for path, (problems, warnings) in zip(paths, results):
+            if problems:
+                failed += 1
+                print(Fore.RED + f"✗ {path}")
+            elif warnings:
+                warned += 1
+                print(Fore.YELLOW + f"! {path}")
+            for warning in warnings:
+                print(Fore.YELLOW + f"    Warning: {warning}")
+            for problem in problems:
+                print(Fore.WHITE + f"    {problem}")
+        color = Fore.RED if failed else Fore.GREEN
+        summary = f"{len(paths)} app(s) checked, {failed} failed"
+        if warned:
+            summary += f", {warned} with warnings"
+        print(color + summary + Fore.CYAN + f" ({elapsed:.2f}s)")
+    return 1 if failed else 0
+
+
+
+# ---------- Legacy .mapp Migration ----------
+def toml_string(value):
+    """A TOML basic string: JSON's escaping, plus DEL, which JSON leaves alone but TOML forbids"""
+    return json.dumps(value, ensure_ascii=False).replace("\x7f", "\\u007F")
+
+
+def toml_key(key):
+    """A bare key if TOML allows one, else a quoted key"""
+    import re
+    return key if re.fullmatch(r"[A-Za-z0-9_-]+", key) else toml_string(key)
+
+
+def toml_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        return toml_string(value)
+    if isinstance(value, list):
+        return "[" + ", ".join(toml_value(v) for v in value) + "]"
+    raise ValueError(f"can't write {type(value).__name__} to manifest.toml")
+
+
+def write_manifest_toml(path, tables):
+    """Write {table: {key: value}} as manifest.toml (flat tables only)"""
+    with open(path, "w", encoding="utf-8") as f:
+        for table, values in tables.items():
+            if not values and table != "app":
+                continue
+            f.write(f"[{toml_key(table)}]\n")
+            for key, value in values.items():
+                f.write(f"{toml_key(str(key))} = {toml_value(value)}\n")
+            f.write("\n")
+
 
+def migrate_mapp(path, username=None):
+    """
+    Rewrite an old-style [JSON]/[PY] .mapp as a packaged (zip) .mapp in place.
+    The original goes to the user's trash, or to PATH.legacy without one.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    json_start = content.find("[JSON]")
+    json_end = content.find("[JSONEND]")
+    py_start = content.find("[PY]")
+    py_end = content.find("[PYEND]")
+    if json_start == -1 or json_end == -1 or py_start == -1 or py_end == -1:
+        raise ValueError("invalid old-style .mapp format")
+    metadata = json.loads(content[json_start + 6 : json_end].strip())
+    code = content[py_start + 4 : py_end].strip()
+
+    tables = {
+        "app": {"entry_point": "main.py", "interactive": metadata.pop("interactive", True)},
+        "limits": metadata.pop("limits", {}),
+        "dependencies": metadata.pop("dependencies", {}),
+        "meta": metadata,
+    }
+    new_path = path + ".migrating"
+    with tempfile.TemporaryDirectory() as tmp:
+        write_manifest_toml(os.path.join(tmp, "manifest.toml"), tables)
+        with open(os.path.join(tmp, "main.py"), "w", encoding="utf-8") as f:
+            f.write(code + "\n")
+        package_mapp(tmp, new_path)
+
+    if not (username and move_to_trash(path, username)):
+        os.replace(path, path + ".legacy")
+    os.replace(new_path, path)
+
+
+def migrate_mapps(args, username=None):
+    """Handle 'mapp migrate [DIR|FILE...]': convert every legacy app found"""
+    paths = []
+    for arg in args or ["."]:
+        if os.path.isdir(arg) and not os.path.exists(os.path.join(arg, "manifest.toml")):
+            try:
+                paths.extend(find_mapps(arg))
+            except OSError as e:
+                print(Fore.RED + f"Cannot read '{arg}': {e}")
+        elif os.path.isfile(arg):
+            paths.append(arg)
+        elif not os.path.exists(arg):
+            print(Fore.RED + f"'{arg}' not found")
+    legacy = [p for p in paths if os.path.isfile(p) and not zipfile.is_zipfile(p)]
+    if not legacy:
+        print(Fore.GREEN + "No legacy .mapp files to migrate.")
+        return
 
-def run_file(filename):
+    migrated = 0
+    for path in legacy:
+        try:
+            migrate_mapp(path, username)
+            migrated += 1
+            print(Fore.GREEN + f"✓ {path}")
+        except Exception as e:
+            print(Fore.RED + f"✗ {path}: {e}")
+    print(Fore.CYAN + f"{migrated} of {len(legacy)} legacy app(s) migrated")
+
+
+def run_file(filename, from_zip=False, username=None, log_file=None):
     """Run a file with its default application"""
     if not os.path.exists(filename):
         print(Fore.RED + f"File '{filename}' not found.")
@@ -1285,7 +3465,7 @@ def run_file(filename):
     
     # Handle .mapp files
     if ext == '.mapp':
-        run_mapp(filename)
+        run_mapp(filename, from_zip, username, log_file)
     # Text files open in editor
     elif ext in ['.txt', '.md', '.log', '.cfg', '.conf', '']:
         print(Fore.CYAN + f"Opening '{filename}' in editor...")
@@ -1317,24 +3497,536 @@ def run_file(filename):
         # Code files and unknown types - just inform the user
         print(Fore.YELLOW + f"Cannot run '{ext}' files. Use 'edit {filename}' to view/edit.")
 
+# ---------- Shared Package Store ----------
+# Downloaded .mapp packages are kept once per machine in BLOB_STORE_DIR,
+# named by SHA-256, so a package another user already downloaded isn't
+# fetched again. Users get a reflink of a blob (shared extents, copy-on-write)
+# where the filesystem supports it, else a hard link to the read-only blob,
+# which Mirage turns into a private copy before writing to it (see
+# unshare_blob_link()); a plain copy is the last resort. Blobs are checked
+# against their name before reuse. gc_blob_store() removes blobs no user
+# links to (link count 1) once unused for BLOB_GRACE.
+BLOB_GRACE = 7 * 24 * 60 * 60  # seconds an unused blob is kept for re-downloads
+BLOB_TMP_GRACE = 60 * 60  # seconds before a leftover partial blob is removed
+FICLONE = 0x40049409  # Linux ioctl: share extents with another file (btrfs, xfs, ...)
+
+
+def blob_path(digest):
+    return os.path.join(BLOB_STORE_DIR, digest[:2], digest)
+
+
+def clone_file(src, dst, hardlink=False):
+    """
+    Put the content of src at dst: reflink, else (with hardlink) a hard
+    link, else a copy. Returns which of "reflink", "hardlink", "copy".
+    """
+    try:
+        import fcntl
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return "reflink"
+    except (ImportError, OSError):
+        pass
+    # Not on Windows: a read-only file can't be deleted there without
+    # clearing the attribute, which a hard link shares with the blob
+    if hardlink and platform.system() != "Windows":
+        try:
+            os.remove(dst)
+        except FileNotFoundError:
+            pass
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+def blob_link_mode():
+    """How users get packages from the blob store on this filesystem (see clone_file())"""
+    os.makedirs(BLOB_STORE_DIR, exist_ok=True)
+    probe = os.path.join(BLOB_STORE_DIR, f".probe.{os.getpid()}.tmp")
+    try:
+        with open(probe, "wb") as f:
+            f.write(b"mirage")
+        return clone_file(probe, probe + ".link", hardlink=True)
+    except OSError:
+        return "copy"
+    finally:
+        for path in (probe, probe + ".link"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def unshare_blob_link(path):
+    """
+    Copy on write for hard-linked packages: replace a read-only file that
+    is linked elsewhere with a private, writable copy, so changing it can't
+    touch the blob store or anyone else's download.
+    """
+    try:
+        st = os.stat(path, follow_symlinks=False)
+    except OSError:
+        return
+    import stat as stat_mod
+    if not stat_mod.S_ISREG(st.st_mode) or st.st_nlink < 2 or st.st_mode & 0o222:
+        return
+    tmp_path = path + f".{os.getpid()}.tmp"
+    shutil.copyfile(path, tmp_path)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def link_blob(digest, local_path):
+    """
+    Atomically put the blob with this digest at local_path (see
+    clone_file()). False if there is no such blob, or it doesn't match its
+    digest (it is removed).
+    """
+    source = blob_path(digest)
+    tmp_path = local_path + f".{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        clone_file(source, tmp_path, hardlink=True)
+        if file_sha256(tmp_path) != digest:
+            os.remove(source)  # damaged: don't hand it out again
+            raise FileNotFoundError(source)
+        os.utime(source)  # last used, for the grace period
+    except OSError:  # including gc_blob_store() removing it under us
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, local_path)
+    return True
+
+
+def add_blob(path, digest, local_path):
+    """
+    Move a verified download to local_path and into the blob store (as a
+    reflink or hard link where possible). If an identical blob is already
+    there, local_path gets that one instead.
+    """
+    target = blob_path(digest)
+    tmp_path = target + f".{os.getpid()}.{threading.get_ident()}.tmp"
+    if os.path.exists(target) and link_blob(digest, local_path):
+        os.remove(path)
+        return
+    try:
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            ensure_hidden(BLOB_STORE_DIR)
+            clone_file(path, tmp_path, hardlink=True)
+            os.chmod(tmp_path, 0o444)  # for a hard link, the download too
+            os.replace(tmp_path, target)
+    except OSError:
+        # e.g. no room or no permission: the download itself is still fine
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    os.replace(path, local_path)
+
+
+def blob_store_stats():
+    """(blobs, bytes stored, blobs hard-linked by users, unlinked blobs unused for BLOB_GRACE)"""
+    blobs = stored = linked = unused = 0
+    now = time.time()
+    for digest_dir in os.scandir(BLOB_STORE_DIR) if os.path.isdir(BLOB_STORE_DIR) else []:
+        if not digest_dir.is_dir():
+            continue
+        for entry in os.scandir(digest_dir.path):
+            if entry.name.endswith(".tmp"):
+                continue
+            st = os.stat(entry.path)  # DirEntry.stat() has no link count on Windows
+            blobs += 1
+            stored += st.st_size
+            if st.st_nlink > 1:
+                linked += 1
+            elif now - st.st_mtime > BLOB_GRACE:
+                unused += 1
+    return blobs, stored, linked, unused
+
+
+def gc_blob_store(grace=BLOB_GRACE):
+    """
+    Remove blobs no user links to that haven't been used for grace seconds;
+    returns bytes freed. A hard-linked blob (link count > 1) is always kept.
+    """
+    freed = 0
+    now = time.time()
+    if not os.path.isdir(BLOB_STORE_DIR):
+        return 0
+    for digest_dir in os.scandir(BLOB_STORE_DIR):
+        if not digest_dir.is_dir():
+            continue
+        for entry in os.scandir(digest_dir.path):
+            try:
+                st = os.stat(entry.path)
+                # .tmp: a blob being written, or left behind by a crash
+                keep = max(grace, BLOB_TMP_GRACE) if entry.name.endswith(".tmp") else grace
+                if st.st_nlink == 1 and now - st.st_mtime > keep:
+                    os.remove(entry.path)
+                    freed += st.st_size
+            except OSError:
+                continue
+    return freed
+
+
+def manage_blob_store(args):
+    """Handle 'ms cache [gc [DAYS]]'"""
+    if not args:
+        blobs, stored, linked, unused = blob_store_stats()
+        mode = blob_link_mode()
+        print(Fore.CYAN + f"Shared package store: {BLOB_STORE_DIR}")
+        print(Fore.WHITE + f"  {blobs} package(s), {format_bytes(stored)} on disk, "
+                           f"{linked} linked by users, {unused} unused for {BLOB_GRACE // 86400} days")
+        if mode == "reflink":
+            print(Fore.WHITE + "  Downloads share storage with the store (reflinks)")
+        elif mode == "hardlink":
+            print(Fore.WHITE + "  Downloads share storage with the store (read-only hard links)")
+        else:
+            print(Fore.YELLOW + "  Copy mode: this filesystem can't share files, so each download "
+                                "is stored twice (in the store and where it was downloaded)")
+    elif args[0] == "gc":
+        try:
+            days = float(args[1]) if len(args) > 1 else BLOB_GRACE / 86400
+        except ValueError:
+            print(Fore.RED + "Usage: ms cache gc [DAYS]")
+            return
+        print(Fore.GREEN + f"✓ Freed {format_bytes(gc_blob_store(days * 86400))}")
+    else:
+        print(Fore.RED + "Usage: ms cache [gc [DAYS]]")
+
 # ---------- Mirage Store Functions ----------
-def mirage_store_list(page_size=5):
-    """List all apps in the Mirage Store with pagination"""
+def load_store_catalog():
+    """Return the locally cached store catalog ({} if there is none yet)"""
     try:
-        import requests, json
-        print(Fore.CYAN + "Fetching apps from Mirage Store...")
-        response = requests.get(f"{STORE_API}/apps", timeout=10)
-        
+        with open(STORE_CATALOG_FILE, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def save_store_catalog(catalog):
+    """Write the store catalog cache atomically, and update the search index"""
+    tmp_path = STORE_CATALOG_FILE + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(catalog, f)
+    os.replace(tmp_path, STORE_CATALOG_FILE)
+    try:
+        update_search_index(catalog)  # keep 'ms search' in step with the catalog
+    except Exception:
+        pass
+
+_store_session = None
+_store_session_lock = threading.Lock()
+
+def store_session():
+    """
+    The requests.Session shared by all store calls, so connections (and TLS
+    handshakes) are reused; its pool fits STORE_MAX_CONNECTIONS requests.
+    """
+    global _store_session
+    with _store_session_lock:
+        if _store_session is None:
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=STORE_MAX_CONNECTIONS, pool_maxsize=STORE_MAX_CONNECTIONS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = "MirageCLI"
+            _store_session = session
+    return _store_session
+
+class StoreUnavailable(requests.RequestException):
+    """
+    Raised without contacting the store while the circuit breaker is open.
+    Not a ConnectionError, so retry loops don't retry it.
+    """
+
+class StoreAppNotFound(Exception):
+    """Raised when the store answers 404 for an app"""
+
+class StoreCircuitBreaker:
+    """
+    Stops store calls for STORE_BREAKER_COOLDOWN seconds after
+    STORE_BREAKER_THRESHOLD calls in a row have failed, so commands fail
+    fast (and fall back to cached data) instead of waiting on timeouts.
+    After the cooldown one trial call is let through; its outcome closes
+    or reopens the breaker.
+    """
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened = None  # time the breaker opened, None while closed
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def check(self):
+        with self.lock:
+            if self.opened is None:
+                return
+            if time.monotonic() - self.opened >= self.cooldown and not self.trial:
+                self.trial = True
+                return
+            raise StoreUnavailable("Mirage Store is unreachable, try again shortly")
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+            self.trial = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened = time.monotonic()
+            self.trial = False
+
+    def release(self):
+        """A call ended without telling whether the store is up (e.g. Ctrl-C): allow another trial"""
+        with self.lock:
+            self.trial = False
+
+_store_breaker = StoreCircuitBreaker(STORE_BREAKER_THRESHOLD, STORE_BREAKER_COOLDOWN)
+
+def store_backoff(attempt):
+    """Seconds to wait before retry number attempt + 1: exponential, with full jitter"""
+    return random.uniform(0, min(STORE_RETRY_MAX_DELAY, STORE_RETRY_BASE_DELAY * 2 ** attempt))
+
+def store_attempts(attempts=STORE_RETRY_ATTEMPTS):
+    """
+    The shared retry policy: yields attempt numbers 0 .. attempts - 1,
+    sleeping store_backoff() before each retry. Loops that can't use
+    store_request() (streamed bodies) iterate over this instead.
+    """
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(store_backoff(attempt - 1))
+        yield attempt
+
+def store_send(method, url, **kwargs):
+    """
+    Send one request to the store over the shared session, through the
+    circuit breaker: raises StoreUnavailable without sending anything while
+    it is open, and records the outcome otherwise.
+    """
+    kwargs.setdefault("timeout", STORE_TIMEOUT)
+    _store_breaker.check()
+    try:
+        response = store_session().request(method, url, **kwargs)
+    except (requests.ConnectionError, requests.Timeout):
+        _store_breaker.record_failure()
+        raise
+    except BaseException:
+        _store_breaker.release()
+        raise
+    if response.status_code in STORE_RETRY_STATUSES:
+        _store_breaker.record_failure()
+    else:
+        _store_breaker.record_success()
+    return response
+
+def store_request(method, url, attempts=STORE_RETRY_ATTEMPTS, **kwargs):
+    """
+    store_send() with the shared retry policy: connection errors, timeouts
+    and 502/503/504 answers are retried. Returns the last response.
+    """
+    for attempt in store_attempts(attempts):
+        last = attempt == attempts - 1
+        try:
+            response = store_send(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if last:
+                raise
+            continue
+        if response.status_code not in STORE_RETRY_STATUSES or last:
+            return response
+        response.close()
+
+def start_store_warmup():
+    """
+    Ping the store in the background so a sleeping backend is awake (and a
+    connection is pooled) by the time the first 'ms' command runs.
+    """
+    def warm_up():
+        try:
+            store_session().post(STORE_API_PING, json={"client": "MirageCLI"},
+                                 timeout=(STORE_TIMEOUT[0], STORE_WARMUP_TIMEOUT))
+            _store_breaker.record_success()
+        except requests.RequestException:
+            pass  # the command that actually needs the store will report it
+
+    threading.Thread(target=warm_up, name="mirage-store-warmup", daemon=True).start()
+
+def store_cache_fresh(entry, refresh=False):
+    """True if a cached catalog entry is younger than STORE_CATALOG_TTL"""
+    return not refresh and time.time() - entry.get("fetched", 0) < STORE_CATALOG_TTL
+
+def conditional_headers(entry):
+    """If-None-Match / If-Modified-Since headers for revalidating a cached entry"""
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+def remember_validators(entry, response):
+    entry["etag"] = response.headers.get("ETag")
+    entry["last_modified"] = response.headers.get("Last-Modified")
+    entry["fetched"] = time.time()
+    return entry
+
+# What parsing one malformed store app can raise (bad TOML, JSON, zip or deflate data)
+STORE_META_ERRORS = (ValueError, zlib.error, zipfile.BadZipFile, NotImplementedError, EOFError, KeyError)
+
+def fetch_store_app_meta(app_file, cached=None):
+    """
+    Fetch the metadata of a store app as a catalog entry {"meta", "etag",
+    "last_modified", "fetched"}. A cached entry is revalidated, costing a
+    304 if the app hasn't changed. Only the first MAPP_META_PREFIX bytes are
+    requested; the whole file is fetched only if the metadata isn't there.
+    """
+    import io
+    cached = cached or {}
+    url = f"{STORE_API}/apps/{app_file}"
+    headers = {"Range": f"bytes=0-{MAPP_META_PREFIX - 1}"}
+    if "meta" in cached:
+        headers.update(conditional_headers(cached))
+    response = store_request("GET", url, headers=headers)
+    if response.status_code == 304 and "meta" in cached:
+        return dict(cached, fetched=time.time())
+    if response.status_code >= 500:
+        response.raise_for_status()
+    entry = remember_validators({"meta": None}, response)
+    if response.status_code not in (200, 206):
+        return entry
+    entry["meta"] = mapp_meta_from_prefix(response.content)
+    if entry["meta"] is not None:
+        return entry
+    if response.status_code == 206:
+        response = store_request("GET", url)
         if response.status_code != 200:
-            print(Fore.RED + f"Error fetching store apps: HTTP {response.status_code}")
+            return entry
+        entry["meta"] = mapp_meta_from_prefix(response.content)  # e.g. old-style, [JSON] past the prefix
+        if entry["meta"] is not None:
+            return entry
+    if zipfile.is_zipfile(io.BytesIO(response.content)):
+        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+            entry["meta"] = read_zip_manifest(zf)[0].get("meta", {})
+    return entry
+
+
+def print_store_app(app_file, metadata):
+    print(Fore.BLUE + f" {app_file}")
+    if metadata is not None:
+        name = metadata.get('name', 'Unknown')
+        version = metadata.get('version', '?')
+        author = metadata.get('author', 'Unknown')
+        desc = metadata.get('description', '')
+
+        print(Fore.YELLOW + f"  Name: {name}")
+        print(Fore.WHITE + f"   Version: {version}")
+        print(Fore.WHITE + f"   Author: {author}")
+        if desc:
+            print(Fore.WHITE + f"     Description: {desc}")
+    print()
+
+def store_app_list(catalog, offline=False, refresh=False):
+    """
+    Sorted app files in the store. They come from catalog (the loaded
+    catalog cache) while it is fresh, or always if offline; otherwise the
+    list is revalidated with a conditional request and catalog is updated
+    in place. Returns (apps, updated); apps is None if there is no list.
+    """
+    if offline or ("apps" in catalog and store_cache_fresh(catalog, refresh)):
+        if "apps" not in catalog:
+            print(Fore.RED + "No cached store catalog yet. Run 'ms list' while online first.")
+            return None, False
+        if offline:
+            fetched = datetime.fromtimestamp(catalog.get("fetched", 0)).strftime('%Y-%m-%d %H:%M')
+            print(Fore.YELLOW + f"Offline: showing the store catalog cached at {fetched}")
+        return catalog["apps"], False
+
+    print(Fore.CYAN + "Fetching apps from Mirage Store...")
+    try:
+        response = store_request(
+            "GET", f"{STORE_API}/apps", headers=conditional_headers(catalog) if "apps" in catalog else {}
+        )
+    except requests.RequestException as e:
+        if "apps" not in catalog:
+            raise
+        fetched = datetime.fromtimestamp(catalog.get("fetched", 0)).strftime('%Y-%m-%d %H:%M')
+        print(Fore.YELLOW + f"Store unreachable ({e}); using the catalog cached at {fetched}")
+        return catalog["apps"], False
+    if response.status_code == 304 and "apps" in catalog:
+        apps = catalog["apps"]
+    elif response.status_code != 200:
+        print(Fore.RED + f"Error fetching store apps: HTTP {response.status_code}")
+        return None, False
+    else:
+        apps = sorted(response.json())
+    catalog["apps"] = apps
+    remember_validators(catalog, response)
+    entries = catalog.setdefault("meta", {})
+    for app_file in set(entries) - set(apps):
+        del entries[app_file]
+    return apps, True
+
+def mirage_store_list(page_size=5, offline=False, refresh=False):
+    """
+    List all apps in the Mirage Store with pagination. The app list and
+    metadata come from the local catalog cache while it is fresh, and are
+    revalidated with conditional requests after that (or with refresh);
+    offline uses the cache only. A page's metadata is fetched concurrently,
+    and the next page is prefetched while it is shown.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = ThreadPoolExecutor(max_workers=STORE_MAX_CONNECTIONS)
+    fetches = {}  # app file -> Future of its catalog entry
+    catalog = load_store_catalog()
+    entries = catalog.setdefault("meta", {})
+    changed = False
+
+    def load_entry(app_file):
+        cached = entries.get(app_file)
+        if cached and (offline or store_cache_fresh(cached, refresh)):
+            return cached
+        if offline:
+            return None
+        try:
+            return fetch_store_app_meta(app_file, cached)
+        except requests.RequestException:
+            if cached:
+                return cached  # store down: stale metadata beats none
+            raise
+
+    def prefetch(names):
+        for app_file in names:
+            if app_file not in fetches:
+                fetches[app_file] = pool.submit(load_entry, app_file)
+
+    try:
+        import requests, json
+        apps, changed = store_app_list(catalog, offline, refresh)
+        if apps is None:
             return
-        
-        apps = response.json()
+
         if not apps:
             print(Fore.YELLOW + "No apps in the store yet.")
             return
-        
-        apps = sorted(apps)
+
         total = len(apps)
         total_pages = (total + page_size - 1) // page_size
         page = 0
@@ -1343,39 +4035,23 @@ def mirage_store_list(page_size=5):
             start = page * page_size
             end = min(start + page_size, total)
             current_apps = apps[start:end]
+            prefetch(current_apps)
+            prefetch(apps[end:end + page_size])  # queued behind this page's requests
             
             print(Fore.CYAN + "═" * 60)
             print(Fore.CYAN + f"Available Apps in Mirage Store (Page {page + 1}/{total_pages})")
             print(Fore.CYAN + "═" * 60)
             
             for app_file in current_apps:
-                base_name = app_file.replace('.mapp', '')
-                print(Fore.BLUE + f" {app_file}")
-                
                 try:
-                    meta_response = requests.get(f"{STORE_API}/apps/{app_file}", timeout=30)
-                    if meta_response.status_code == 200:
-                        content = meta_response.text
-                        json_start = content.find('[JSON]')
-                        json_end = content.find('[JSONEND]')
-                        
-                        if json_start != -1 and json_end != -1:
-                            json_str = content[json_start + 6:json_end].strip()
-                            metadata = json.loads(json_str)
-                            
-                            name = metadata.get('name', 'Unknown')
-                            version = metadata.get('version', '?')
-                            author = metadata.get('author', 'Unknown')
-                            desc = metadata.get('description', '')
-                            
-                            print(Fore.YELLOW + f"  Name: {name}")
-                            print(Fore.WHITE + f"   Version: {version}")
-                            print(Fore.WHITE + f"   Author: {author}")
-                            if desc:
-                                print(Fore.WHITE + f"     Description: {desc}")
+                    entry = fetches[app_file].result()
                 except Exception:
-                    pass
-                print()
+                    entry = None
+                    del fetches[app_file]  # retry if the page is shown again
+                if entry is not None and entry is not entries.get(app_file):
+                    entries[app_file] = entry
+                    changed = True
+                print_store_app(app_file, entry["meta"] if entry else None)
             
             # Pagination controls
             print(Fore.CYAN + f"Showing {start + 1}-{end} of {total} apps")
@@ -1397,50 +4073,524 @@ def mirage_store_list(page_size=5):
         print(Fore.YELLOW + "Install with: pip install requests")
     except Exception as e:
         print(Fore.RED + f"Error connecting to Mirage Store: {e}")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        if changed:
+            try:
+                save_store_catalog(catalog)
+            except Exception:
+                pass
+
+def format_bytes(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024.0 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{int(size)} B"
+        size /= 1024.0
+
+class TransferProgress:
+    """
+    Progress bar with throughput for store transfers, shared by any number
+    of threads. Redraws at most every 0.1s, and only on a terminal.
+    """
+    bar_length = 30
+
+    def __init__(self, label, total=0):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+        self.drawn = 0.0
+        self.lock = threading.Lock()
+
+    def add_total(self, size):
+        with self.lock:
+            self.total += size
+
+    def update(self, size):
+        with self.lock:
+            self.done += size
+            now = time.perf_counter()
+            if IS_TTY and now - self.drawn >= 0.1:
+                self.drawn = now
+                self.draw(now)
+
+    def draw(self, now, end=""):
+        progress = min(1.0, self.done / self.total) if self.total else 0.0
+        filled = int(self.bar_length * progress)
+        bar = '█' * filled + '░' * (self.bar_length - filled)
+        rate = self.done / max(now - self.started, 1e-6)
+        sizes = f"{format_bytes(self.done)}/{format_bytes(self.total)}" if self.total else format_bytes(self.done)
+        clear_eol = "\x1b[K" if IS_TTY else ""
+        print(f"\r{Fore.GREEN}{self.label} [{bar}] {int(progress * 100)}% {sizes} {format_bytes(rate)}/s{clear_eol}",
+              end=end, flush=True)
+
+    def finish(self):
+        with self.lock:
+            self.draw(time.perf_counter(), end="\n")
+
+def server_sha256(response):
+    """
+    The SHA-256 of the full file as announced by the store, hex encoded:
+    Repr-Digest / Digest (RFC 9530 / 3230) or X-Checksum-SHA256. None if
+    the server didn't send one.
+    """
+    import base64
+    import re
+    for header in ("Repr-Digest", "Digest"):
+        match = re.search(r"sha-256=:?([A-Za-z0-9+/=]+):?", response.headers.get(header, ""), re.I)
+        if match:
+            return base64.b64decode(match.group(1)).hex()
+    value = response.headers.get("X-Checksum-SHA256")
+    return value.strip().lower() if value else None
+
+def download_store_app(filename, local_path, progress=None, attempts=STORE_RETRY_ATTEMPTS, shared=True):
+    """
+    Stream a store app to local_path. Data goes to a hidden .part file next
+    to it, which is resumed with an HTTP Range request if a download was
+    interrupted (here, after a dropped connection, or in an earlier
+    session). The finished file is checked against the store's SHA-256 and
+    size, then moved into place with a copy kept in the shared package
+    store; packages already in that store are copied instead of downloaded.
+    With shared=False the package store is neither used nor filled.
+    Returns (size, source), source being "downloaded" or "package store".
+    Raises StoreAppNotFound if the store has no such app.
+    """
+    directory, name = os.path.split(os.path.abspath(local_path))
+    part_path = os.path.join(directory, f".{name}.part")
+    state_path = part_path + ".json"  # validators of the partial download
+    url = f"{STORE_API}/apps/{filename}"
+    own_progress = progress is None
+    if own_progress:
+        progress = TransferProgress(filename)
+    counted = 0  # bytes of this file reported to progress
+    known_total = 0
+    finished = False
 
-def mirage_store_download(filename):
-    """Download an app from the Mirage Store"""
+    try:
+        for attempt in store_attempts(attempts):
+            try:
+                state = {}
+                if os.path.exists(part_path):
+                    try:
+                        with open(state_path, "r") as f:
+                            state = json.load(f)
+                    except Exception:
+                        os.remove(part_path)  # can't tell which version it belongs to
+                validator = state.get("etag") or state.get("last_modified")
+                offset = os.path.getsize(part_path) if validator else 0
+                if validator and state.get("size") and offset >= state["size"]:
+                    # All there already (interrupted while verifying): check it
+                    progress.add_total(offset - known_total)
+                    progress.update(offset - counted)
+                    break
+
+                # identity encoding keeps byte ranges, sizes and hashes about the file itself
+                headers = {"Accept-Encoding": "identity"}
+                if offset:
+                    headers["Range"] = f"bytes={offset}-"
+                    headers["If-Range"] = validator
+                with store_send("GET", url, headers=headers, stream=True) as response:
+                    if response.status_code == 404:
+                        raise StoreAppNotFound(filename)
+                    if response.status_code == 416:
+                        # Stale partial: drop it, the next attempt starts over
+                        os.remove(part_path)
+                        if attempt == attempts - 1:
+                            raise requests.HTTPError(f"416 Range Not Satisfiable for {filename}",
+                                                     response=response)
+                        continue
+                    if response.status_code in STORE_RETRY_STATUSES and attempt < attempts - 1:
+                        continue
+                    response.raise_for_status()
+
+                    if response.status_code == 206:
+                        total = int(response.headers["Content-Range"].rsplit("/", 1)[1])
+                    else:
+                        offset = 0  # the server sent the whole (possibly changed) file
+                        total = int(response.headers.get("Content-Length", 0))
+                        digest = server_sha256(response)
+                        if shared and digest and link_blob(digest, local_path):
+                            # Already on this machine: skip the body
+                            for path in (part_path, state_path):
+                                if os.path.exists(path):
+                                    os.remove(path)
+                            size = os.path.getsize(local_path)
+                            progress.add_total(size - known_total)
+                            progress.update(size - counted)
+                            finished = True
+                            return size, "package store"
+                        state = {
+                            "etag": response.headers.get("ETag"),
+                            "last_modified": response.headers.get("Last-Modified"),
+                            "sha256": digest,
+                            "size": total,
+                        }
+                        with open(state_path, "w") as f:
+                            json.dump(state, f)
+                    progress.add_total(total - known_total)
+                    progress.update(offset - counted)
+                    known_total, counted = total, offset
+
+                    with open(part_path, "r+b" if offset else "wb") as f:
+                        f.truncate(offset)
+                        f.seek(offset)
+                        for chunk in response.iter_content(chunk_size=64 * 1024):
+                            f.write(chunk)
+                            progress.update(len(chunk))
+                            counted += len(chunk)
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                if attempt == attempts - 1:
+                    raise
+
+        try:
+            size = os.path.getsize(part_path)
+            digest = file_sha256(part_path)
+            if state.get("size") and size != state["size"]:
+                raise ValueError(f"size mismatch ({size} of {state['size']} bytes)")
+            if state.get("sha256") and digest != state["sha256"]:
+                raise ValueError("checksum mismatch, the download is corrupt")
+            if shared:
+                add_blob(part_path, digest, local_path)
+            else:
+                os.replace(part_path, local_path)
+        except Exception:
+            for path in (part_path, state_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            raise
+        os.remove(state_path)
+        finished = True
+        return size, "downloaded"
+    finally:
+        # Also ends a progress line a failed download left half-drawn
+        if own_progress and (finished or progress.drawn):
+            progress.finish()
+
+def download_store_apps(filenames, directory="."):
+    """
+    Download several store apps into directory at once, at most
+    STORE_MAX_CONNECTIONS at a time over the shared session, with one
+    aggregate progress bar. Prints a per-app summary; returns the number
+    of failures.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    progress = TransferProgress(f"{len(filenames)} app(s)")
+
+    def download(filename):
+        started = time.perf_counter()
+        try:
+            size, source = download_store_app(filename, os.path.join(directory, filename), progress)
+            status = "downloaded" if source == "downloaded" else "from package store"
+            return status, size, time.perf_counter() - started
+        except StoreAppNotFound:
+            return "not in store", None, time.perf_counter() - started
+        except requests.HTTPError as e:
+            return f"HTTP {e.response.status_code}", None, time.perf_counter() - started
+        except Exception as e:
+            return f"failed: {e}", None, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=STORE_MAX_CONNECTIONS) as pool:
+        results = list(pool.map(download, filenames))
+    progress.finish()
+    elapsed = time.perf_counter() - started
+
+    failed = 0
+    width = max(len(name) for name in filenames)
+    for filename, (status, size, duration) in zip(filenames, results):
+        ok = status in ("downloaded", "from package store")
+        failed += not ok
+        line = f"  {'✓' if ok else '✗'} {filename:<{width}}  {status}"
+        if ok:
+            line += f"  {format_bytes(size)} in {duration:.1f}s"
+        print((Fore.GREEN if ok else Fore.RED) + line)
+    print(Fore.CYAN + f"{len(filenames) - failed} of {len(filenames)} app(s) downloaded in {elapsed:.1f}s")
+    return failed
+
+def resolve_store_names(patterns, apps):
+    """
+    Store file names for download arguments: plain names get '.mapp' added,
+    glob patterns are matched against the store catalog (apps).
+    Returns (names, patterns that matched nothing).
+    """
+    import fnmatch
+    names = []
+    unmatched = []
+    for pattern in patterns:
+        if any(c in pattern for c in "*?["):
+            matches = [app for app in apps
+                       if fnmatch.fnmatch(app, pattern) or fnmatch.fnmatch(app[:-5], pattern)]
+            if not matches:
+                unmatched.append(pattern)
+            names += matches
+        else:
+            names.append(pattern if pattern.endswith('.mapp') else pattern + '.mapp')
+    return list(dict.fromkeys(names)), unmatched
+
+def mirage_store_download(patterns):
+    """Download one or more apps (names or glob patterns) from the Mirage Store"""
     try:
         import requests
-        
-        # Add .mapp extension if not present
-        if not filename.endswith('.mapp'):
-            filename += '.mapp'
-        
-        print(Fore.CYAN + f"Downloading '{filename}' from Mirage Store...")
-        
-        response = requests.get(f"{STORE_API}/apps/{filename}", timeout=30)
-        
-        if response.status_code == 200:
-            # Check if file already exists locally
-            local_path = os.path.join(os.getcwd(), filename)
-            
-            if os.path.exists(local_path):
-                overwrite = input(Fore.YELLOW + f"'{filename}' already exists. Overwrite? (yes/no): ").strip().lower()
-                if overwrite != 'yes':
+
+        apps = []
+        if any(c in p for p in patterns for c in "*?["):
+            catalog = load_store_catalog()
+            apps, changed = store_app_list(catalog)
+            if apps is None:
+                return
+            if changed:
+                save_store_catalog(catalog)
+        filenames, unmatched = resolve_store_names(patterns, apps)
+        for pattern in unmatched:
+            print(Fore.YELLOW + f"No store apps match '{pattern}'")
+        if not filenames:
+            return
+
+        # Check if files already exist locally
+        existing = [f for f in filenames if os.path.exists(os.path.join(os.getcwd(), f))]
+        if existing:
+            shown = f"'{existing[0]}' already exists" if len(existing) == 1 else f"{len(existing)} apps already exist"
+            overwrite = input(Fore.YELLOW + f"{shown}. Overwrite? (yes/no): ").strip().lower()
+            if overwrite != 'yes':
+                filenames = [f for f in filenames if f not in existing]
+                if not filenames:
                     print(Fore.YELLOW + "Download cancelled.")
                     return
-            
-            # Save the file
-            with open(local_path, 'wb') as f:
-                f.write(response.content)
-            
+
+        if len(filenames) > 1:
+            print(Fore.CYAN + f"Downloading {len(filenames)} apps from Mirage Store...")
+            download_store_apps(filenames, os.getcwd())
+            return
+
+        filename = filenames[0]
+        print(Fore.CYAN + f"Downloading '{filename}' from Mirage Store...")
+        _, source = download_store_app(filename, os.path.join(os.getcwd(), filename))
+        if source == "downloaded":
             print(Fore.GREEN + f"✓ Downloaded '{filename}' successfully!")
-            print(Fore.CYAN + f"  Run with: run {filename}")
-        
-        elif response.status_code == 404:
-            print(Fore.RED + f"App '{filename}' not found in store.")
-            print(Fore.YELLOW + "Use 'ms list' to see available apps.")
         else:
-            print(Fore.RED + f"Error downloading: HTTP {response.status_code}")
-    
+            print(Fore.GREEN + f"✓ Got '{filename}' from the shared package store (already on this machine)")
+        print(Fore.CYAN + f"  Run with: run {filename}")
+
+    except StoreAppNotFound as e:
+        print(Fore.RED + f"App '{e}' not found in store.")
+        print(Fore.YELLOW + "Use 'ms list' to see available apps.")
+    except requests.HTTPError as e:
+        print(Fore.RED + f"Error downloading: HTTP {e.response.status_code}")
+    except requests.RequestException as e:
+        print(Fore.RED + f"Error downloading from store: {e}")
+        print(Fore.YELLOW + "Run the same download again to resume it.")
+    except OSError as e:  # local: writing the download or the package store
+        print(Fore.RED + f"Error saving download: {e}")
     except ImportError:
         print(Fore.RED + "Error: 'requests' module not installed")
         print(Fore.YELLOW + "Install with: pip install requests")
     except Exception as e:
         print(Fore.RED + f"Error downloading from store: {e}")
 
-def mirage_store_upload(filename, current_user):
+def load_sync_manifest(path):
+    """
+    Read an 'ms sync' manifest: TOML with an [apps] table mapping app names
+    to a version, or "*" for whatever the store has.
+    """
+    with open(path, "rb") as f:
+        wanted = tomllib.load(f).get("apps", {})
+    return {(name if name.endswith('.mapp') else name + '.mapp'): str(version)
+            for name, version in wanted.items()}
+
+def mirage_store_sync(args, username=None):
+    """
+    Handle 'ms sync MANIFEST [DIR] [--prune]': download the apps listed in
+    MANIFEST that are missing from DIR or at another version, and with
+    --prune move .mapp files that aren't listed to the trash.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    prune = "--prune" in args
+    args = [a for a in args if a != "--prune"]
+    if not args:
+        print(Fore.RED + "Usage: ms sync MANIFEST [DIR] [--prune]")
+        return
+    directory = args[1] if len(args) > 1 else os.getcwd()
+    try:
+        wanted = load_sync_manifest(args[0])
+    except Exception as e:
+        print(Fore.RED + f"Error reading '{args[0]}': {e}")
+        return
+    os.makedirs(directory, exist_ok=True)
+
+    catalog = load_store_catalog()
+    entries = catalog.setdefault("meta", {})
+
+    def store_version(app_file):
+        """(catalog entry, problem) for an app; one unreadable app doesn't stop the sync"""
+        cached = entries.get(app_file)
+        if not (cached and store_cache_fresh(cached)):
+            try:
+                cached = fetch_store_app_meta(app_file, cached)
+            except requests.RequestException:
+                if not cached:
+                    raise
+            except STORE_META_ERRORS as e:
+                return cached, f"{app_file}: unreadable in store ({type(e).__name__}: {e})"
+        return cached, None
+
+    # Compare local and store versions, asking the store for everything at once
+    to_fetch = []
+    problems = []
+    try:
+        with ThreadPoolExecutor(max_workers=STORE_MAX_CONNECTIONS) as pool:
+            store_entries = dict(zip(wanted, pool.map(store_version, wanted)))
+    except requests.RequestException as e:
+        print(Fore.RED + f"Error connecting to Mirage Store: {e}")
+        return
+    for app_file, version in wanted.items():
+        entry, problem = store_entries[app_file]
+        if problem:
+            problems.append(problem)
+            continue
+        entries[app_file] = entry
+        store_meta = entry["meta"]
+        if store_meta is None:
+            problems.append(f"{app_file}: not in store")
+            continue
+        available = str(store_meta.get("version", "?"))
+        if version != "*" and available != version:
+            problems.append(f"{app_file}: version {version} wanted, store has {available}")
+            continue
+        local = read_mapp_meta(os.path.join(directory, app_file))
+        if local is None or str(local.get("version", "?")) != available:
+            to_fetch.append(app_file)
+    try:
+        save_store_catalog(catalog)
+    except Exception:
+        pass
+
+    for problem in problems:
+        print(Fore.RED + f"  ✗ {problem}")
+    print(Fore.CYAN + f"{len(wanted) - len(to_fetch) - len(problems)} app(s) up to date, {len(to_fetch)} to download")
+    if to_fetch:
+        download_store_apps(to_fetch, directory)
+
+    if prune:
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".mapp") and entry.is_file() and entry.name not in wanted:
+                if username and move_to_trash(entry.path, username):
+                    print(Fore.YELLOW + f"  Moved '{entry.name}' to trash (not in manifest)")
+                else:
+                    print(Fore.YELLOW + f"  '{entry.name}' is not in the manifest (left in place)")
+
+def multipart_param(value):
+    """Escape a name or filename for a Content-Disposition header, as browsers do"""
+    return str(value).replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+def multipart_upload_body(path, fields, boundary, progress, chunk_size=64 * 1024):
+    """
+    A multipart/form-data body as (chunk generator, length), with the file
+    streamed from disk chunk by chunk instead of read into memory.
+    """
+    head = b""
+    for name, value in fields.items():
+        value = "\r\n".join(str(value).splitlines())  # line breaks in form values are CRLF
+        head += (f'--{boundary}\r\nContent-Disposition: form-data; name="{multipart_param(name)}"\r\n\r\n'
+                 f'{value}\r\n').encode("utf-8")
+    head += (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+             f'filename="{multipart_param(os.path.basename(path))}"\r\n'
+             'Content-Type: application/octet-stream\r\n\r\n').encode("utf-8")
+    tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+    def chunks():
+        yield head
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                progress.update(len(chunk))
+                yield chunk
+        yield tail
+
+    return chunks(), len(head) + os.path.getsize(path) + len(tail)
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of chunks on the fly"""
+    import zlib
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+class StreamBody:
+    """
+    File-like view of a chunk generator of known length. requests sends it
+    with a Content-Length, where a bare generator would be sent chunked.
+    """
+    def __init__(self, chunks, length):
+        self.chunks = chunks
+        self.length = length
+        self.buffer = b""
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        if size < 0:
+            data, self.buffer = self.buffer, b""
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+def connect_failed(error):
+    """True if a request failed before reaching the store, so sending it again can't duplicate it"""
+    import urllib3.exceptions
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, "reason", reason)  # urllib3's MaxRetryError wraps the cause
+    return isinstance(reason, (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError))
+
+def upload_store_app(path, fields, compress=False):
+    """
+    Upload an app to the store as a streamed multipart body, gzipped on the
+    fly with compress. An upload isn't idempotent, so it is only retried
+    when it can't have been received: the connection failed, or the store
+    answered 502/503/504. Each attempt gets a fresh body. Returns the final
+    response.
+    """
+    import uuid
+    for attempt in store_attempts():
+        boundary = uuid.uuid4().hex
+        progress = TransferProgress(os.path.basename(path), os.path.getsize(path))
+        chunks, length = multipart_upload_body(path, fields, boundary, progress)
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        if compress:
+            headers["Content-Encoding"] = "gzip"
+            body = gzip_chunks(chunks)  # length unknown: sent chunked
+        else:
+            body = StreamBody(chunks, length)
+        last = attempt == STORE_RETRY_ATTEMPTS - 1
+        try:
+            # one request per body: a streamed body can't be replayed by store_request
+            response = store_send("POST", f"{STORE_API}/upload", data=body, headers=headers)
+            progress.finish()
+            if response.status_code not in STORE_RETRY_STATUSES or last:
+                return response
+            reason = f"HTTP {response.status_code}"
+        except (requests.ConnectionError, requests.Timeout) as e:
+            progress.finish()
+            if last or not connect_failed(e):
+                raise  # e.g. a read timeout: the store may have the upload already
+            reason = type(e).__name__
+        print(Fore.YELLOW + f"Upload failed ({reason}), retrying...")
+
+def mirage_store_upload(filename, current_user, compress=False):
     """Upload an app to the Mirage Store"""
     try:
         import requests
@@ -1454,8 +4604,8 @@ def mirage_store_upload(filename, current_user):
             print(Fore.RED + f"File '{filename}' not found.")
             return
         
-        # Parse the .mapp file to get metadata
-        metadata, code = parse_mapp_file(filename)
+        # Read the app's metadata (without extracting it)
+        metadata = read_mapp_meta(filename)
         if metadata is None:
             print(Fore.RED + "Invalid .mapp file format. Cannot upload.")
             return
@@ -1469,17 +4619,15 @@ def mirage_store_upload(filename, current_user):
         print(Fore.YELLOW + f"   App: {metadata.get('name', 'Unknown')}")
         print(Fore.YELLOW + f"   Version: {metadata.get('version', '?')}")
         print(Fore.YELLOW + f"   Author: {metadata.get('author', 'Unknown')}")
+        print(Fore.YELLOW + f"   Size: {format_bytes(os.path.getsize(filename))}" + (" (sent gzipped)" if compress else ""))
         
         confirm = input(Fore.YELLOW + "\nProceed with upload? (yes/no): ").strip().lower()
         if confirm != 'yes':
             print(Fore.YELLOW + "Upload cancelled.")
             return
         
-        # Read file content
-        with open(filename, 'rb') as f:
-            files = {'file': (filename, f, 'application/octet-stream')}
-            
-            response = requests.post(f"{STORE_API}/upload", files=files, timeout=30)
+        response = upload_store_app(filename, {"author": metadata['author']}, compress)
+        filename = os.path.basename(filename)
         
         if response.status_code == 200:
             result = response.json()
@@ -1505,6 +4653,488 @@ def mirage_store_upload(filename, current_user):
         print(Fore.YELLOW + "Install with: pip install requests")
     except Exception as e:
         print(Fore.RED + f"Error uploading to store: {e}")
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))  # ceil
+    return sorted_values[int(rank) - 1]
+
+def probe_connection_phases(url):
+    """Time DNS lookup, TCP connect and TLS handshake to url's host, in ms"""
+    import ssl
+    from urllib.parse import urlsplit
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    phases = {}
+    started = time.perf_counter()
+    family, kind, proto, _, address = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)[0]
+    phases["dns"] = (time.perf_counter() - started) * 1000
+    sock = socket.socket(family, kind, proto)
+    try:
+        sock.settimeout(STORE_TIMEOUT[0])
+        started = time.perf_counter()
+        sock.connect(address)
+        phases["connect"] = (time.perf_counter() - started) * 1000
+        if parts.scheme == "https":
+            started = time.perf_counter()
+            ssl.create_default_context().wrap_socket(sock, server_hostname=parts.hostname).close()
+            phases["tls"] = (time.perf_counter() - started) * 1000
+    finally:
+        sock.close()
+    return phases
+
+def connections_opened(session):
+    """How many connections a session's pools have opened so far"""
+    total = 0
+    for adapter in session.adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            total += getattr(pools.get(key), "num_connections", 0)
+    return total
+
+def mirage_store_ping(args):
+    """
+    Handle 'ms ping [-n COUNT] [-i INTERVAL] [--concurrency K]': measure the
+    round-trip time of COUNT pings over K reused connections. The first
+    request (which may wake the store up) and requests that had to open a
+    connection (e.g. after an error) are reported apart from the warm ones.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from requests.adapters import HTTPAdapter
+
+    count, interval, concurrency = 1, 0.0, 1
+    try:
+        i = 0
+        while i < len(args):
+            if args[i] == "-n":
+                count = max(1, int(args[i + 1]))
+            elif args[i] == "-i":
+                interval = max(0.0, float(args[i + 1]))
+            elif args[i] in ("--concurrency", "-c"):
+                concurrency = max(1, int(args[i + 1]))
+            else:
+                raise ValueError(args[i])
+            i += 2
+    except (IndexError, ValueError):
+        print(Fore.RED + "Usage: ms ping [-n COUNT] [-i INTERVAL] [--concurrency K]")
+        return
+    concurrency = min(concurrency, count)
+
+    print(Fore.YELLOW + "Pinging Mirage Store server..."
+          + (f" ({count} requests, {concurrency} at a time)" if count > 1 else ""))
+    try:
+        phases = probe_connection_phases(STORE_API_PING)
+    except OSError as e:
+        print(Fore.RED + f"✗ Could not reach Mirage Store: {e}")
+        return
+
+    first = {"rtt": None, "response": None}
+    first_lock = threading.Lock()
+
+    def worker(n):
+        # One session (one kept-alive connection) per worker, so only its
+        # first request pays for connecting
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_maxsize=1))
+        session.mount("http://", HTTPAdapter(pool_maxsize=1))
+        cold, warm, errors = [], [], []
+        for i in range(n):
+            if i and interval:
+                time.sleep(interval)
+            opened = connections_opened(session)
+            started = time.perf_counter()
+            try:
+                response = session.post(STORE_API_PING, json={"client": "MirageCLI"}, timeout=STORE_TIMEOUT)
+                rtt = (time.perf_counter() - started) * 1000
+                if response.status_code != 200:
+                    errors.append(f"HTTP {response.status_code}")
+                    continue
+            except requests.RequestException as e:
+                errors.append(type(e).__name__)
+                continue
+            with first_lock:
+                if first["rtt"] is None:
+                    first["rtt"], first["response"] = rtt, response
+                    continue
+            (cold if connections_opened(session) > opened else warm).append(rtt)
+        session.close()
+        return cold, warm, errors
+
+    shares = [count // concurrency + (k < count % concurrency) for k in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, shares))
+    elapsed = time.perf_counter() - started
+    cold = sorted(rtt for c, _, _ in results for rtt in c)
+    warm = sorted(rtt for _, w, _ in results for rtt in w)
+    errors = [e for _, _, errs in results for e in errs]
+
+    if first["response"] is not None and count == 1:
+        try:
+            data = first["response"].json()
+            print(Fore.GREEN + "✓ Mirage Store is online!")
+            print(Fore.CYAN + f"  Server:     {data.get('server', 'Unknown')}")
+            print(Fore.CYAN + f"  Status:     {data.get('status', 'Unknown')}")
+            print(Fore.CYAN + f"  B2 Status:  {data.get('b2_status', 'Unknown')}")
+            print(Fore.CYAN + f"  Latency:    {data.get('latency_ms', 'N/A')} ms (server)")
+            print(Fore.CYAN + f"  Uptime:     {data.get('uptime', 'N/A')}")
+            print(Fore.CYAN + f"  Timestamp:  {data.get('timestamp', 'N/A')}")
+        except ValueError:
+            print(Fore.RED + "✗ Invalid JSON response from server.")
+            print(Fore.RED + f"Raw output: {first['response'].text}")
+
+    line = f"  DNS {phases['dns']:.1f} ms, connect {phases['connect']:.1f} ms"
+    if "tls" in phases:
+        line += f", TLS {phases['tls']:.1f} ms"
+    print(Fore.CYAN + "  Connection: " + line.strip())
+    if first["rtt"] is not None:
+        print(Fore.CYAN + f"  First:      {first['rtt']:.1f} ms (cold: new connection, may wake the store)")
+    if cold:
+        print(Fore.CYAN + f"  New conn:   {len(cold)} x, p50 {percentile(cold, 50):.1f} ms, max {cold[-1]:.1f} ms")
+    if warm:
+        stats = ", ".join(f"{label} {value:.1f}" for label, value in [
+            ("min", warm[0]), ("p50", percentile(warm, 50)), ("p95", percentile(warm, 95)),
+            ("p99", percentile(warm, 99)), ("max", warm[-1])])
+        print(Fore.CYAN + f"  Warm:       {len(warm)} x, {stats} ms")
+    if errors:
+        kinds = ", ".join(f"{errors.count(e)} {e}" for e in sorted(set(errors)))
+        print(Fore.RED + f"  Errors:     {len(errors)} of {count} ({kinds})")
+    if count > 1:
+        print(Fore.CYAN + f"  Total:      {elapsed:.2f}s, {count / elapsed:.1f} requests/s")
+
+SEARCH_FIELD_WEIGHTS = {"name": 3, "author": 2, "description": 1}
+SEARCH_RESULTS = 20
+
+def search_terms(text):
+    import re
+    return re.findall(r"[a-z0-9]+", str(text).lower())
+
+def document_terms(app_file, meta):
+    """Weighted terms of a store app: {term: weight}"""
+    weights = {}
+    fields = [(app_file[:-5] if app_file.endswith(".mapp") else app_file, SEARCH_FIELD_WEIGHTS["name"])]
+    fields += [(meta.get(field, ""), weight) for field, weight in SEARCH_FIELD_WEIGHTS.items()] if meta else []
+    for text, weight in fields:
+        for term in search_terms(text):
+            weights[term] = weights.get(term, 0) + weight
+    return weights
+
+def search_index_valid(index):
+    """True if a loaded index is whole: every document's terms have postings for it"""
+    try:
+        docs, postings = index["docs"], index["postings"]
+        return isinstance(postings, dict) and all(
+            isinstance(doc["stamp"], str) and isinstance(doc["length"], (int, float))
+            and isinstance(doc["indexed"], bool)
+            and all(app_file in postings[term] for term in doc["terms"])
+            for app_file, doc in docs.items())
+    except (KeyError, TypeError, AttributeError):
+        return False
+
+def load_search_index():
+    """The search index, or an empty one (rebuilt from the catalog) if it is missing or damaged"""
+    try:
+        with open(STORE_INDEX_FILE, "r") as f:
+            index = json.load(f)
+        if search_index_valid(index):
+            return index
+    except Exception:
+        pass
+    return {"docs": {}, "postings": {}}
+
+def update_search_index(catalog):
+    """
+    Bring the search index in line with the catalog cache, re-indexing only
+    the apps whose metadata changed. Returns the index.
+    """
+    index = load_search_index()
+    docs, postings = index["docs"], index["postings"]
+    entries = catalog.get("meta", {})
+    apps = set(catalog.get("apps", []))
+    changed = False
+
+    def remove(app_file):
+        for term in docs.pop(app_file)["terms"]:
+            postings[term].pop(app_file, None)
+            if not postings[term]:
+                del postings[term]
+
+    for app_file in [a for a in docs if a not in apps]:
+        remove(app_file)
+        changed = True
+    for app_file in apps:
+        meta = (entries.get(app_file) or {}).get("meta")
+        stamp = hashlib.sha1(json.dumps(meta, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        if app_file in docs:
+            if docs[app_file]["stamp"] == stamp:
+                continue
+            remove(app_file)
+        weights = document_terms(app_file, meta)
+        for term, weight in weights.items():
+            postings.setdefault(term, {})[app_file] = weight
+        docs[app_file] = {"stamp": stamp, "terms": sorted(weights),
+                          "length": sum(weights.values()), "indexed": meta is not None}
+        changed = True
+
+    if changed:
+        tmp_path = STORE_INDEX_FILE + f".{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, STORE_INDEX_FILE)
+        except OSError:
+            pass  # searching still works; the index is rebuilt next time
+    return index
+
+def search_store_index(index, query, limit=SEARCH_RESULTS):
+    """
+    Rank apps for a query: BM25 over the weighted terms, where every query
+    word also matches as a prefix (at half weight). Apps matching more of
+    the query words come first. Returns [(app file, words matched, score)].
+    """
+    import bisect
+    import math
+    docs, postings = index["docs"], index["postings"]
+    if not docs:
+        return []
+    terms = sorted(postings)
+    avg_length = sum(d["length"] for d in docs.values()) / len(docs) or 1
+    k1, b = 1.2, 0.75
+    scores, matched = {}, {}
+    for word in dict.fromkeys(search_terms(query)):
+        best = {}
+        i = bisect.bisect_left(terms, word)
+        while i < len(terms) and terms[i].startswith(word):
+            term = terms[i]
+            idf = math.log(1 + (len(docs) - len(postings[term]) + 0.5) / (len(postings[term]) + 0.5))
+            boost = 1.0 if term == word else 0.5
+            for app_file, weight in postings[term].items():
+                norm = k1 * (1 - b + b * docs[app_file]["length"] / avg_length)
+                score = boost * idf * weight * (k1 + 1) / (weight + norm)
+                best[app_file] = max(best.get(app_file, 0.0), score)
+            i += 1
+        for app_file, score in best.items():
+            scores[app_file] = scores.get(app_file, 0.0) + score
+            matched[app_file] = matched.get(app_file, 0) + 1
+    ranked = sorted(scores, key=lambda a: (-matched[a], -scores[a], a))
+    return [(a, matched[a], scores[a]) for a in ranked[:limit]]
+
+def refresh_store_metadata(catalog):
+    """
+    Fetch the metadata of the apps in the catalog that have none cached yet
+    (cached entries are revalidated by 'ms list'). Returns the apps that
+    couldn't be read, as "app: reason" strings.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    entries = catalog.setdefault("meta", {})
+    missing = [a for a in catalog.get("apps", []) if not (entries.get(a) or {}).get("meta")]
+    if not missing:
+        return []
+    print(Fore.CYAN + f"Fetching details of {len(missing)} app(s)...")
+
+    def fetch(app_file):
+        try:
+            return fetch_store_app_meta(app_file, entries.get(app_file)), None
+        except requests.RequestException as e:
+            return entries.get(app_file), f"{app_file}: {e}"  # keep what we had
+        except STORE_META_ERRORS as e:
+            return entries.get(app_file), f"{app_file}: unreadable ({type(e).__name__}: {e})"
+
+    problems = []
+    with ThreadPoolExecutor(max_workers=STORE_MAX_CONNECTIONS) as pool:
+        for app_file, (entry, problem) in zip(missing, pool.map(fetch, missing)):
+            if entry is not None:
+                entries[app_file] = entry
+            if problem:
+                problems.append(problem)
+    return problems
+
+def mirage_store_search(args):
+    """
+    Handle 'ms search [--update] QUERY': search the cached store catalog by
+    name, author and description through the local index. --update first
+    refreshes the app list and fetches the metadata of apps not yet cached.
+    """
+    update = "--update" in args
+    query = " ".join(a for a in args if a != "--update")
+    catalog = load_store_catalog()
+    try:
+        if update:
+            apps, _ = store_app_list(catalog)
+            if apps is None:
+                return
+            for problem in refresh_store_metadata(catalog):
+                print(Fore.RED + f"  ✗ {problem}")
+            save_store_catalog(catalog)
+    except requests.RequestException as e:
+        print(Fore.RED + f"Error connecting to Mirage Store: {e}")
+        return
+    except OSError as e:
+        print(Fore.RED + f"Error saving the store catalog: {e}")
+    if "apps" not in catalog:
+        print(Fore.RED + "No cached store catalog yet. Run 'ms search --update' or 'ms list' first.")
+        return
+
+    started = time.perf_counter()
+    index = update_search_index(catalog)
+    results = search_store_index(index, query) if query.strip() else []
+    elapsed = time.perf_counter() - started
+    unindexed = sum(not d["indexed"] for d in index["docs"].values())
+
+    if query.strip():
+        entries = catalog.get("meta", {})
+        if not results:
+            print(Fore.YELLOW + f"No apps match '{query}'.")
+        words = len(dict.fromkeys(search_terms(query)))
+        for app_file, matched, score in results:
+            meta = (entries.get(app_file) or {}).get("meta") or {}
+            line = Fore.BLUE + f" {app_file}" + Fore.YELLOW + f"  {meta.get('name', app_file[:-5])}"
+            if 'version' in meta:
+                line += Fore.WHITE + f" v{meta['version']}"
+            if meta.get('author'):
+                line += Fore.WHITE + f" by {meta['author']}"
+            if matched < words:
+                line += Fore.CYAN + f"  ({matched}/{words} words)"
+            print(line)
+            if meta.get('description'):
+                print(Fore.WHITE + f"     {meta['description']}")
+    print(Fore.CYAN + f"{len(index['docs'])} app(s) in the index, searched in {elapsed * 1000:.0f} ms")
+    if unindexed:
+        print(Fore.YELLOW + f"{unindexed} app(s) are searchable by file name only; "
+                            "'ms search --update' fetches their details")
+
+# ---------- Tab Completion ----------
+try:
+    import readline
+except ImportError:
+    readline = None  # Windows without pyreadline3: plain input()
+
+COMMANDS = [
+    "help", "pwd", "ls", "cd", "cat", "head", "tail", "grep", "wc", "echo",
+    "touch", "mkdir", "rm", "trash", "cp", "mv", "rename", "ln", "find", "tree",
+    "count", "du", "info", "pull", "run", "mapp", "edit", "history", "sysinfo",
+    "uptime", "whoami", "fortune", "alias", "clear", "calc", "notes", "todo",
+    "apps", "switch", "logout", "dusr", "exit", "ms"
+]
+SUBCOMMANDS = {
+    "mapp": ["list", "new", "package", "pkg", "env", "check", "migrate"],
+    "ms": ["list", "search", "download", "sync", "upload", "ping", "cache"],
+    "alias": ["list", "add", "del", "remove"],
+    "trash": ["list", "restore", "empty"],
+    "history": ["clear"],
+}
+LISTING_CACHE_SIZE = 64
+
+_listing_cache = {}  # absolute path -> ((st_dev, st_ino, st_mtime_ns), sorted names, set of directory names)
+_completion_matches = []
+
+
+def cached_listing(directory):
+    """List a directory, reusing the previous result while it is the same, unchanged directory"""
+    directory = os.path.abspath(directory)  # "." is another directory after cd
+    try:
+        st = os.stat(directory)
+    except OSError:
+        return [], set()
+    stamp = (st.st_dev, st.st_ino, st.st_mtime_ns)
+
+    cached = _listing_cache.get(directory)
+    if cached and cached[0] == stamp:
+        return cached[1], cached[2]
+
+    names = []
+    dirs = set()
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                names.append(entry.name)
+                try:
+                    if entry.is_dir():  # uses d_type, no extra stat on most filesystems
+                        dirs.add(entry.name)
+                except OSError:
+                    pass
+    except OSError:
+        return [], set()
+    names.sort()
+
+    if len(_listing_cache) >= LISTING_CACHE_SIZE:
+        _listing_cache.pop(next(iter(_listing_cache)))
+    _listing_cache[directory] = (stamp, names, dirs)
+    return names, dirs
+
+
+def _prefix_matches(sorted_names, prefix):
+    """All names in a sorted list that start with prefix (binary search for the start)"""
+    import bisect
+    i = bisect.bisect_left(sorted_names, prefix)
+    matches = []
+    while i < len(sorted_names) and sorted_names[i].startswith(prefix):
+        matches.append(sorted_names[i])
+        i += 1
+    return matches
+
+
+def complete_path(text):
+    dirname, base = os.path.split(text)
+    names, dirs = cached_listing(os.path.expanduser(dirname) if dirname else ".")
+    matches = []
+    for name in _prefix_matches(names, base):
+        if name.startswith(".") and not base.startswith("."):
+            continue
+        path = os.path.join(dirname, name) if dirname else name
+        matches.append(path + "/" if name in dirs else path)
+    return matches
+
+
+def complete_store_app(text):
+    apps = load_store_catalog().get("apps", [])
+    return [a for a in apps if a.startswith(text)]
+
+
+def completer(text, state):
+    """readline completer for command names, subcommands and paths"""
+    global _completion_matches
+    if state == 0:
+        line = readline.get_line_buffer()
+        words = line[:readline.get_begidx()].split()
+        try:
+            if not words:
+                names = COMMANDS + list(load_aliases().keys())
+                _completion_matches = sorted(n for n in set(names) if n.startswith(text))
+            elif len(words) == 1 and words[0] in SUBCOMMANDS:
+                _completion_matches = [c for c in SUBCOMMANDS[words[0]] if c.startswith(text)]
+            elif words[:2] == ["ms", "download"]:
+                _completion_matches = complete_store_app(text)
+            else:
+                _completion_matches = complete_path(text)
+        except Exception:
+            _completion_matches = []
+    if state < len(_completion_matches):
+        return _completion_matches[state]
+    return None
+
+
+def setup_completion():
+    """Enable tab completion if readline is available"""
+    if readline is None:
+        return
+    readline.set_completer(completer)
+    readline.set_completer_delims(" \t\n")
+    if "libedit" in (readline.__doc__ or ""):
+        readline.parse_and_bind("bind ^I rl_complete")
+    else:
+        readline.parse_and_bind("tab: complete")
+
+
+def readline_prompt(prompt):
+    """Mark color codes as zero-width so readline measures the prompt correctly"""
+    if readline is None or not USE_COLOR:
+        return prompt
+    import re
+    return re.sub(r"(\x1b\[[0-9;]*m)", "\x01\\1\x02", prompt)
+
 # ---------- Main OS ----------
 def mirage():
     splash_screen()
@@ -1512,11 +5142,16 @@ def mirage():
     if current_user is None:
         return  # or show menu again, or exit cleanly
 
+    start_trash_purger()
+    start_fork_server()
+    if STORE_WARMUP:
+        start_store_warmup()
+    setup_completion()
     aliases = load_aliases()
 
     while True:
         try:
-            cmd = input(Fore.MAGENTA + f"{current_user}@Mirage:{Fore.CYAN}{os.path.basename(os.getcwd())}> " + Fore.WHITE).strip()
+            cmd = input(readline_prompt(Fore.MAGENTA + f"{current_user}@Mirage:{Fore.CYAN}{os.path.basename(os.getcwd())}> " + Fore.WHITE)).strip()
         except (EOFError, KeyboardInterrupt):
             print("\n" + Fore.GREEN + "Exiting Mirage...")
             sys.exit()
@@ -1532,7 +5167,8 @@ def mirage():
         command = parts[0]
 
         if command == "help":
-            help_menu()
+            with batched_output():
+                help_menu()
         elif command == "pwd":
             print(Fore.CYAN + os.getcwd())
         elif command == "ls":
@@ -1540,11 +5176,12 @@ def mirage():
             files = os.listdir(".")
             if not show_all:
                 files = [f for f in files if not f.startswith('.')]
-            for f in sorted(files):
-                if os.path.isdir(f):
-                    print(Fore.BLUE + f + "/")
-                else:
-                    print(Fore.WHITE + f)
+            with batched_output():
+                for f in sorted(files):
+                    if os.path.isdir(f):
+                        print(Fore.BLUE + f + "/")
+                    else:
+                        print(Fore.WHITE + f)
         elif command == "cd":
             if len(parts) > 1:
                 path = parts[1]
@@ -1560,7 +5197,7 @@ def mirage():
             if len(parts) > 1:
                 fname = parts[1]
                 try:
-                    with open(fname, "r") as f:
+                    with open(fname, "r") as f, batched_output():
                         print(f.read())
                 except FileNotFoundError:
                     print(Fore.RED + "File not found.")
@@ -1602,6 +5239,7 @@ def mirage():
         elif command == "touch":
             if len(parts) > 1:
                 fname = parts[1]
+                unshare_blob_link(fname)
                 open(fname, "a").close()
                 print(Fore.GREEN + f"Created '{fname}'")
             else:
@@ -1615,20 +5253,11 @@ def mirage():
                 print(Fore.RED + "Usage: mkdir DIR")
         elif command == "rm":
             if len(parts) > 1:
-                fname = parts[1]
-                if os.path.exists(fname):
-                    try:
-                        if os.path.isdir(fname):
-                            shutil.rmtree(fname)
-                        else:
-                            os.remove(fname)
-                        print(Fore.GREEN + f"Deleted '{fname}'")
-                    except Exception as e:
-                        print(Fore.RED + f"Error: {e}")
-                else:
-                    print(Fore.RED + "File not found.")
+                remove_path(parts[1:], current_user)
             else:
-                print(Fore.RED + "Usage: rm FILE")
+                print(Fore.RED + "Usage: rm [-f] [--now] FILE")
+        elif command == "trash":
+            manage_trash(parts[1:], current_user)
         elif command == "cp":
             if len(parts) > 2:
                 src, dst = parts[1], parts[2]
@@ -1664,12 +5293,14 @@ def mirage():
                 print(Fore.RED + "Usage: ln SOURCE LINK")
         elif command == "find":
             if len(parts) > 1:
-                find_files(parts[1])
+                with batched_output():
+                    find_files(parts[1])
             else:
                 print(Fore.RED + "Usage: find TERM")
         elif command == "tree":
-            print(Fore.BLUE + ".\n")
-            show_tree()
+            with batched_output():
+                print(Fore.BLUE + ".\n")
+                show_tree()
         elif command == "count":
             count_files()
         elif command == "du":
@@ -1685,14 +5316,41 @@ def mirage():
             else:
                 print(Fore.RED + "Usage: pull PATH")
         elif command == "run":
-            if len(parts) > 1:
-                run_file(parts[1])
+            usage = "Usage: run [--zip] [--log LOG] FILE  |  run --parallel N [--yes] [--log LOG] A.mapp B.mapp ..."
+            args = parts[1:]
+            options = {}
+            try:
+                for flag in ("--log", "--parallel"):
+                    if flag in args:
+                        i = args.index(flag)
+                        options[flag] = args[i + 1]
+                        args = args[:i] + args[i + 2:]
+                jobs = int(options["--parallel"]) if "--parallel" in options else None
+                if jobs is not None and jobs < 1:
+                    raise ValueError
+            except (IndexError, ValueError):
+                args = []
+            from_zip = "--zip" in args
+            assume_yes = "--yes" in args or "-y" in args
+            args = [a for a in args if a not in ("--zip", "--yes", "-y")]
+            if not args:
+                print(Fore.RED + usage)
+            elif jobs is not None:
+                run_mapps_parallel(args, jobs, assume_yes, current_user, from_zip, options.get("--log"))
+            elif len(args) > 1:
+                print(Fore.RED + "Several apps given: run them together with 'run --parallel N A.mapp B.mapp ...'")
             else:
-                print(Fore.RED + "Usage: run FILE")
+                run_file(args[0], from_zip=from_zip, username=current_user, log_file=options.get("--log"))
         elif command == "mapp":
             if len(parts) > 1:
                 if parts[1] == "list":
-                    list_mapps()
+                    list_mapps(parts[2:])
+                elif parts[1] == "check":
+                    check_mapps(parts[2:])
+                elif parts[1] == "migrate":
+                    migrate_mapps(parts[2:], current_user)
+                elif parts[1] == "env":
+                    manage_app_envs(parts[2:])
                 elif parts[1] == "new":
                     if len(parts) > 2:
                         filename = parts[2]
@@ -1700,16 +5358,12 @@ def mirage():
                     else:
                         print(Fore.RED + "Usage: mapp new FILENAME")
                 elif parts[1].lower() == "package" or parts[1].lower() == "pkg":
-                    if len(parts) < 3:
-                        print(Fore.RED + "Usage: mapp package <dir>")
-                    else:
-                        folder_path = parts[2]
-                        package_mapp_command(parts)  # calls the function we wrote earlier
+                    package_mapp_command(parts)
                 else:
                     print(Fore.RED + "Unknown mapp command. Use: list, new")
             else:
                 print(Fore.YELLOW + "mapp commands: list, new")
-                print(Fore.CYAN + "  mapp list      - List all .mapp files")
+                print(Fore.CYAN + "  mapp list [DIR] - List all .mapp files")
                 print(Fore.CYAN + "  mapp new FILE  - Create new .mapp template")
         elif command == "edit":
             if len(parts) > 1:
@@ -1766,49 +5420,49 @@ def mirage():
         elif command == "ms":
             if len(parts) > 1:
                 if parts[1] == "list":
-                    mirage_store_list()
+                    mirage_store_list(offline="--offline" in parts, refresh="--refresh" in parts)
                 elif parts[1] == "download":
                     if len(parts) > 2:
-                        mirage_store_download(parts[2])
+                        mirage_store_download(parts[2:])
                     else:
-                        print(Fore.RED + "Usage: ms download FILENAME")
+                        print(Fore.RED + "Usage: ms download NAME|PATTERN...")
+                elif parts[1] == "sync":
+                    mirage_store_sync(parts[2:], current_user)
                 elif parts[1] == "upload":
-                    if len(parts) > 2:
-                        mirage_store_upload(parts[2], current_user)
+                    files = [p for p in parts[2:] if p != "--compress"]
+                    if files:
+                        mirage_store_upload(files[0], current_user, compress="--compress" in parts)
                     else:
-                        print(Fore.RED + "Usage: ms upload FILENAME")
+                        print(Fore.RED + "Usage: ms upload FILENAME [--compress]")
                 elif parts[1] == "ping":
-                    print(Fore.YELLOW + "Pinging Mirage Store server...")
-                    try:
-                        response = requests.post(STORE_API_PING, json={"client": "MirageCLI"}, timeout=30)
-                        if response.status_code == 200:
-                            try:
-                                data = response.json()
-                                print(Fore.GREEN + "✓ Mirage Store is online!")
-                                print(Fore.CYAN + f"  Server:     {data.get('server', 'Unknown')}")
-                                print(Fore.CYAN + f"  Status:     {data.get('status', 'Unknown')}")
-                                print(Fore.CYAN + f"  B2 Status:  {data.get('b2_status', 'Unknown')}")
-                                print(Fore.CYAN + f"  Latency:    {data.get('latency_ms', 'N/A')} ms")
-                                print(Fore.CYAN + f"  Uptime:     {data.get('uptime', 'N/A')}")
-                                print(Fore.CYAN + f"  Timestamp:  {data.get('timestamp', 'N/A')}")
-                            except ValueError:
-                                print(Fore.RED + "✗ Invalid JSON response from server.")
-                                print(Fore.RED + f"Raw output: {response.text}")
-                        else:
-                            print(Fore.RED + f"✗ Server responded with status {response.status_code}: {response.text}")
-                    except requests.exceptions.RequestException as e:
-                        print(Fore.RED + f"✗ Could not reach Mirage Store: {e}")
+                    mirage_store_ping(parts[2:])
+                elif parts[1] == "cache":
+                    manage_blob_store(parts[2:])
+                elif parts[1] == "search":
+                    if len(parts) > 2:
+                        mirage_store_search(parts[2:])
+                    else:
+                        print(Fore.RED + "Usage: ms search [--update] QUERY")
                 else:
-                    print(Fore.RED + "Unknown ms command. Use: list, download, upload, ping")
+                    print(Fore.RED + "Unknown ms command. Use: list, search, download, sync, upload, ping, cache")
 
             else:
                 print(Fore.YELLOW + "Mirage Store commands:")
                 print(Fore.CYAN + "  ms list           - List apps in store")
+                print(Fore.CYAN + "  ms search QUERY   - Search apps in store")
                 print(Fore.CYAN + "  ms download FILE  - Download app from store")
+                print(Fore.CYAN + "  ms sync MANIFEST  - Download the apps listed in MANIFEST")
                 print(Fore.CYAN + "  ms upload FILE    - Upload app to store")
-                print(Fore.CYAN + "  ms ping           - Ping The Mirage Store servers" )
+                print(Fore.CYAN + "  ms ping           - Ping The Mirage Store servers (-n COUNT -i INTERVAL --concurrency K)")
+                print(Fore.CYAN + "  ms cache [gc]     - Show or clean the shared package store")
         else:
             print(Fore.RED + f"Unknown command: {command}")
             print(Fore.YELLOW + "Type 'help' for available commands")
 if __name__ == "__main__":
-    mirage()
\ No newline at end of file
+    if IS_FORK_SERVER:
+        _fork_server_main(int(sys.argv[2]))
+    elif sys.argv[1:3] == ["mapp", "check"]:
+        # Scriptable entry for deployment gates: exits non-zero on failure
+        sys.exit(check_mapps(sys.argv[3:]))
+    else:
+        mirage()
\ No newline at end of file
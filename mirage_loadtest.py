@@ -0,0 +1,166 @@
+"""
+Load test for the Mirage Store client. Drives the client functions in
+mirage.py (catalog listing, downloads, uploads) against a store, by default
+an in-process mirage_store_stub, and reports throughput and latency.
+
+    python mirage_loadtest.py -n 200 -c 8 --latency 50 --error-rate 0.02
+    python mirage_loadtest.py --url http://127.0.0.1:8000 --ops download
+
+Uploads are only sent to a local store unless --allow-upload is given,
+so pointing --url at the real store can't flood it with test apps.
+    python mirage_loadtest.py --out results.jsonl   # append a record per run
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import mirage
+import mirage_store_stub
+
+OPS = ["list", "download", "upload"]
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+LIST_PAGE_SIZE = 5  # apps whose metadata 'ms list' fetches for its first page
+
+
+def op_list(ctx):
+    """What 'ms list' does for its first page: the app list, then that page's metadata"""
+    apps, _ = mirage.store_app_list({}, refresh=True)
+    if apps is None:
+        raise RuntimeError("no app list")
+    with ThreadPoolExecutor(max_workers=LIST_PAGE_SIZE) as pool:
+        entries = list(pool.map(mirage.fetch_store_app_meta, apps[:LIST_PAGE_SIZE]))
+    if any(entry["meta"] is None for entry in entries):
+        raise RuntimeError("missing metadata")
+    return 0
+
+
+def op_download(ctx):
+    app_file = random.choice(ctx["apps"])
+    path = os.path.join(ctx["tmp"], f"{threading.get_ident()}-{app_file}")
+    progress = mirage.TransferProgress(app_file)
+    size, _ = mirage.download_store_app(app_file, path, progress, shared=False)  # measure the network
+    os.remove(path)
+    return size
+
+
+def op_upload(ctx):
+    response = mirage.upload_store_app(ctx["upload_file"], {"author": "loadtest"})
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}")
+    return os.path.getsize(ctx["upload_file"])
+
+
+def run_op(name, func, ctx, count, concurrency):
+    """Run func count times, concurrency at a time; returns the op's statistics"""
+    def timed(_):
+        started = time.perf_counter()
+        try:
+            size = func(ctx)
+            return (time.perf_counter() - started) * 1000, size, None
+        except Exception as e:
+            return (time.perf_counter() - started) * 1000, 0, type(e).__name__
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(count)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(ms for ms, _, error in results if error is None)
+    errors = [error for _, _, error in results if error is not None]
+    return {
+        "op": name,
+        "count": count,
+        "errors": len(errors),
+        "error_kinds": {e: errors.count(e) for e in sorted(set(errors))},
+        "seconds": round(elapsed, 3),
+        "ops_per_s": round(count / elapsed, 1),
+        "mb_per_s": round(sum(size for _, size, _ in results) / elapsed / 1e6, 2),
+        **{f"p{p}_ms": round(mirage.percentile(latencies, p), 1) if latencies else None
+           for p in (50, 95, 99)},
+        "max_ms": round(latencies[-1], 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Mirage Store client")
+    parser.add_argument("--url", help="store to test (default: start a local stub)")
+    parser.add_argument("--ops", default=",".join(OPS), help="comma-separated: " + ", ".join(OPS))
+    parser.add_argument("-n", "--requests", type=int, default=100, help="operations per op type")
+    parser.add_argument("-c", "--concurrency", type=int, default=mirage.STORE_MAX_CONNECTIONS)
+    parser.add_argument("--apps", type=int, default=200, help="stub catalog size")
+    parser.add_argument("--app-size", type=int, default=256 * 1024, help="stub payload bytes per app")
+    parser.add_argument("--latency", type=float, default=20.0, help="stub latency per request (ms)")
+    parser.add_argument("--jitter", type=float, default=5.0, help="stub latency jitter (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stub 503 rate")
+    parser.add_argument("--allow-upload", action="store_true",
+                        help="allow the upload op against a --url that isn't local")
+    parser.add_argument("--out", help="append the results as a JSON line to this file")
+    args = parser.parse_args()
+    ops = [op.strip() for op in args.ops.split(",") if op.strip()]
+    unknown = set(ops) - set(OPS)
+    if unknown:
+        parser.error("unknown op(s): " + ", ".join(sorted(unknown)))
+    if ("upload" in ops and args.url and not args.allow_upload
+            and urlsplit(args.url).hostname not in LOCAL_HOSTS):
+        parser.error("refusing to upload test apps to a remote store; pick --ops without "
+                     "upload, or pass --allow-upload")
+
+    server = None
+    if args.url:
+        url = args.url.rstrip("/")
+    else:
+        state = mirage_store_stub.StoreState(args.apps, args.app_size, args.latency / 1000,
+                                             args.jitter / 1000, args.error_rate)
+        server = mirage_store_stub.make_server(state)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the user's real catalog cache and package store out of it
+        mirage.STORE_API = url
+        mirage.STORE_API_PING = url + "/ping"
+        mirage.STORE_CATALOG_FILE = os.path.join(tmp, "store_catalog.json")
+        mirage.STORE_INDEX_FILE = os.path.join(tmp, "store_search_index.json")
+        mirage.BLOB_STORE_DIR = os.path.join(tmp, "blobs")
+        upload_file = os.path.join(tmp, "loadtest.mapp")
+        with open(upload_file, "wb") as f:
+            f.write(mirage_store_stub.build_app("loadtest", "1.0", "loadtest", "Load test upload",
+                                                args.app_size))
+        ctx = {"tmp": tmp, "upload_file": upload_file}
+
+        print(f"Store: {url}  ops: {', '.join(ops)}  {args.requests} each, {args.concurrency} at a time")
+        results = []
+        with contextlib.redirect_stdout(io.StringIO()):  # the client's own progress output
+            ctx["apps"], _ = mirage.store_app_list({}, refresh=True)
+            for op in ops:
+                results.append(run_op(op, globals()["op_" + op], ctx, args.requests, args.concurrency))
+
+    print(f"{'op':<10}{'ops/s':>8}{'MB/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'errors':>8}")
+    for r in results:
+        cells = [f"{r[k]:.1f}" if r[k] is not None else "-" for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms")]
+        print(f"{r['op']:<10}{r['ops_per_s']:>8}{r['mb_per_s']:>8}" + "".join(f"{c:>9}" for c in cells)
+              + f"{r['errors']:>8}")
+    print("(latencies in ms)")
+
+    if args.out:
+        record = {"time": time.time(), "url": url, "requests": args.requests,
+                  "concurrency": args.concurrency, "stub": None if args.url else {
+                      "apps": args.apps, "app_size": args.app_size, "latency_ms": args.latency,
+                      "jitter_ms": args.jitter, "error_rate": args.error_rate},
+                  "results": results}
+        with open(args.out, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
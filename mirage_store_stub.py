@@ -0,0 +1,256 @@
+"""
+Local stand-in for the Mirage Store, for testing and benchmarking the store
+client offline. It serves a generated catalog of packaged .mapp apps:
+
+    GET  /apps          JSON list of app files (ETag / If-None-Match)
+    GET  /apps/<name>   the app (Range / If-Range, ETag, Repr-Digest)
+    POST /upload        multipart upload, optionally gzipped or chunked
+    POST /ping          status report, like the real store
+
+Run it and point Mirage at it:
+
+    python mirage_store_stub.py --port 8000 --latency 50 --error-rate 0.02
+    MIRAGE_STORE_API=http://127.0.0.1:8000 python mirage.py
+"""
+import argparse
+import base64
+import email.parser
+import gzip
+import hashlib
+import io
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zipfile
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ["calc", "notes", "weather", "snake", "todo", "clock", "paint", "chat", "quiz", "timer",
+         "music", "maze", "dice", "chess", "budget", "recipe", "journal", "pong", "matrix", "radio"]
+AUTHORS = ["alice", "bob", "carol", "dave", "erin", "frank"]
+
+
+def build_app(name, version, author, description, size):
+    """A packaged .mapp (manifest.toml first, stored) with about size bytes of payload"""
+    manifest = (f'[app]\nentry_point = "main.py"\ninteractive = false\n\n'
+                f'[meta]\nname = "{name}"\nversion = "{version}"\n'
+                f'author = "{author}"\ndescription = "{description}"\n')
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as zf:
+        zf.writestr(zipfile.ZipInfo("manifest.toml", (1980, 1, 1, 0, 0, 0)), manifest,
+                    compress_type=zipfile.ZIP_STORED)
+        zf.writestr(zipfile.ZipInfo("main.py", (1980, 1, 1, 0, 0, 0)), f"print('Hello from {name}')\n")
+        if size:
+            payload = random.Random(name).randbytes(size)  # incompressible, like real assets
+            zf.writestr(zipfile.ZipInfo("data.bin", (1980, 1, 1, 0, 0, 0)), payload)
+    return out.getvalue()
+
+
+class StoreState:
+    """Catalog and settings shared by all request threads"""
+
+    def __init__(self, apps=50, app_size=64 * 1024, latency=0.0, jitter=0.0, error_rate=0.0,
+                 cold_start=0.0, seed=0):
+        rng = random.Random(seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.cold_start = cold_start
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.files = {}  # app file -> (data, etag, last modified)
+        self.catalog_version = 0  # bumped on every change, for the catalog ETag
+        for i in range(apps):
+            word = WORDS[i % len(WORDS)]
+            name = f"{word}{i}" if i >= len(WORDS) else word
+            self.add(name + ".mapp", build_app(
+                name, f"1.{i % 10}.0", rng.choice(AUTHORS),
+                f"A small {word} app for Mirage, number {i}", app_size))
+
+    def add(self, app_file, data):
+        etag = '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+        with self.lock:
+            self.files[app_file] = (data, etag, formatdate(time.time(), usegmt=True))
+            self.catalog_version += 1
+
+    def delay(self):
+        """Sleep like a remote (and possibly just woken) store would"""
+        if self.cold_start:
+            with self.lock:
+                wait, self.cold_start = self.cold_start, 0.0
+            time.sleep(wait)
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def should_fail(self):
+        return self.error_rate and random.random() < self.error_rate
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MirageStoreStub/1.0"
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    state = None  # set by make_server()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_bytes(self, status, body, content_type="application/octet-stream", headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers:
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def send_json(self, status, value, headers=()):
+        self.send_bytes(status, json.dumps(value).encode("utf-8"), "application/json", headers)
+
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if not size:
+                    self.rfile.readline()
+                    break
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        else:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+        return body
+
+    def start(self):
+        """Common prologue: latency, then maybe an injected error. True to go on."""
+        self.state.delay()
+        if self.state.should_fail():
+            if self.command == "POST":
+                self.read_body()
+            self.send_json(503, {"error": "injected failure"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self.start():
+            return
+        if self.path == "/apps":
+            with self.state.lock:
+                names = sorted(self.state.files)
+                etag = f'"catalog-{self.state.catalog_version}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_bytes(304, b"", headers=[("ETag", etag)])
+            else:
+                self.send_json(200, names, [("ETag", etag)])
+            return
+
+        match = re.fullmatch(r"/apps/([^/]+)", self.path)
+        with self.state.lock:
+            found = self.state.files.get(match.group(1)) if match else None
+        if found is None:
+            self.send_json(404, {"error": "not found"})
+            return
+        data, etag, last_modified = found
+        headers = [("ETag", etag), ("Last-Modified", last_modified), ("Accept-Ranges", "bytes"),
+                   ("Repr-Digest", "sha-256=:" + base64.b64encode(hashlib.sha256(data).digest()).decode() + ":")]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_bytes(304, b"", headers=headers)
+            return
+
+        range_match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if range_match and (if_range is None or if_range in (etag, last_modified)):
+            start = int(range_match.group(1))
+            end = min(int(range_match.group(2) or len(data) - 1), len(data) - 1)
+            if start >= len(data):
+                self.send_bytes(416, b"", headers=[("Content-Range", f"bytes */{len(data)}")])
+                return
+            headers.append(("Content-Range", f"bytes {start}-{end}/{len(data)}"))
+            self.send_bytes(206, data[start:end + 1], headers=headers)
+        else:
+            self.send_bytes(200, data, headers=headers)
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        if not self.start():
+            return
+        if self.path == "/ping":
+            self.read_body()
+            self.send_json(200, {
+                "server": "mirage-store-stub",
+                "status": "ok",
+                "b2_status": "n/a",
+                "latency_ms": round(self.state.latency * 1000),
+                "uptime": f"{time.time() - self.state.started:.0f}s",
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+            })
+        elif self.path == "/upload":
+            body = self.read_body()
+            message = email.parser.BytesParser().parsebytes(
+                b"Content-Type: " + self.headers.get("Content-Type", "").encode() + b"\r\n\r\n" + body)
+            upload = None
+            for part in message.get_payload() if message.is_multipart() else []:
+                if part.get_param("name", header="content-disposition") == "file":
+                    upload = (part.get_filename(), part.get_payload(decode=True))
+            if not upload or not upload[0]:
+                self.send_json(400, {"error": "no file in upload"})
+                return
+            filename, data = upload
+            with self.state.lock:
+                base, n = filename[:-5] if filename.endswith(".mapp") else filename, 1
+                while filename in self.state.files:  # keep existing apps, like the real store
+                    filename = f"{base}-{n}.mapp"
+                    n += 1
+            self.state.add(filename, data)
+            self.send_json(200, {"filename": filename, "size": len(data)})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping kept-alive connections is routine, not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def make_server(state, host="127.0.0.1", port=0):
+    """A threaded stub server (not yet serving); port 0 picks a free port"""
+    handler = type("Handler", (StubHandler,), {"state": state})
+    return StubServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Mirage Store")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--apps", type=int, default=50, help="catalog size")
+    parser.add_argument("--app-size", type=int, default=64 * 1024, help="payload bytes per app")
+    parser.add_argument("--latency", type=float, default=0.0, help="added latency per request (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency jitter, +/- ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument("--cold-start", type=float, default=0.0, help="delay of the first request (s)")
+    args = parser.parse_args()
+
+    state = StoreState(args.apps, args.app_size, args.latency / 1000, args.jitter / 1000,
+                       args.error_rate, args.cold_start)
+    server = make_server(state, args.host, args.port)
+    print(f"Mirage Store stub on http://{args.host}:{server.server_port} ({args.apps} apps)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()